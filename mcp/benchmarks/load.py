@@ -0,0 +1,394 @@
+"""
+Load and soak harness: N concurrent MCP clients issuing tool calls.
+
+Two transports:
+- inprocess (default): one server (one lifespan, one mock robot link) shared
+  by N in-memory client sessions. Measures tool latency, command loss,
+  server memory and event-loop lag, so it is the mode for soak runs.
+- stdio: N separate `python -m bittle_mcp --mock` processes, exactly as an
+  MCP client would spawn them. Measures tool latency and errors, plus the
+  servers' combined RSS where /proc is available.
+
+Load profiles (each client runs one; "mixed" assigns them round-robin):
+- joystick: bursts of forced direction sends, like a held stick
+- sequence: long unoptimized sequences
+- status:   status polling, every 10th call with refresh=True
+
+Every --interval seconds a sample is recorded (p50/p99 latency, calls,
+errors, lost writes, RSS, loop lag). The JSON report can be compared with a
+previous run via --compare.
+
+Usage:
+    uv run python benchmarks/load.py --clients 8 --duration 60
+    uv run python benchmarks/load.py --profile joystick --write-latency 15 -o run.json
+    uv run python benchmarks/load.py --duration 3600 --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.shared.memory import create_connected_server_and_client_session
+
+PROFILES = ("joystick", "sequence", "status")
+ADDRESS = "AA:BB:CC:DD:EE:FF"
+DIRECTIONS = ("forward", "left", "right", "backward")
+
+
+@dataclass
+class Window:
+    """Measurements collected between two samples."""
+
+    latencies: list[float] = field(default_factory=list)
+    calls: int = 0
+    errors: int = 0
+    expected_writes: int = 0
+
+
+@dataclass
+class Recorder:
+    """Shared by all clients; the sampler swaps out the window each interval."""
+
+    window: Window = field(default_factory=Window)
+    all_latencies: list[float] = field(default_factory=list)
+    totals: dict[str, int] = field(
+        default_factory=lambda: {"calls": 0, "errors": 0, "expected_writes": 0, "writes": 0}
+    )
+    in_flight: int = 0
+
+    def record(self, latency: float, ok: bool, expected_writes: int) -> None:
+        self.window.latencies.append(latency)
+        self.window.calls += 1
+        if ok:
+            self.window.expected_writes += expected_writes
+        else:
+            self.window.errors += 1
+
+    def count_write(self, command: str) -> None:
+        """Send listener on the shared connection: count writes that reached the link."""
+        self.totals["writes"] += 1
+
+    def rotate(self) -> Window:
+        window, self.window = self.window, Window()
+        self.all_latencies.extend(window.latencies)
+        self.totals["calls"] += window.calls
+        self.totals["errors"] += window.errors
+        self.totals["expected_writes"] += window.expected_writes
+        return window
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile, or None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _ms(value: float | None) -> float | None:
+    return None if value is None else round(value * 1000, 3)
+
+
+def _rss_bytes(pid: str = "self") -> int | None:
+    """Resident set size of a process from /proc, or None where unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _children_rss_bytes() -> int | None:
+    """Combined RSS of this process's direct children (the stdio servers)."""
+    try:
+        pids = []
+        for tid in os.listdir("/proc/self/task"):
+            with open(f"/proc/self/task/{tid}/children") as f:
+                pids.extend(f.read().split())
+    except OSError:
+        return None
+    sizes = [_rss_bytes(pid) for pid in pids]
+    return sum(s for s in sizes if s is not None) if pids else None
+
+
+# --- profiles ---
+
+async def _call(session: ClientSession, recorder: Recorder, tool: str, args: dict, writes: int) -> None:
+    start = time.perf_counter()
+    recorder.in_flight += 1
+    try:
+        result = await session.call_tool(tool, args)
+        text = " ".join(getattr(c, "text", "") for c in result.content)
+        ok = not result.isError and not text.startswith(("Error", "Send failed", "Move failed"))
+        ok = ok and "Failed" not in text
+    except Exception:
+        ok = False
+    finally:
+        recorder.in_flight -= 1
+    recorder.record(time.perf_counter() - start, ok, writes)
+
+
+async def joystick(session: ClientSession, recorder: Recorder, stop: asyncio.Event) -> None:
+    for burst in itertools.count():
+        if stop.is_set():
+            return
+        direction = DIRECTIONS[burst % len(DIRECTIONS)]
+        for _ in range(10):
+            await _call(session, recorder, "send", {"command": direction, "force": True}, 1)
+        await asyncio.sleep(0.2)
+
+
+async def sequence(session: ClientSession, recorder: Recorder, stop: asyncio.Event) -> None:
+    steps = [
+        {"command": command, "delay": 0.01}
+        for command in ("walk_forward", "left", "walk_forward", "right", "bark") * 4
+    ]
+    while not stop.is_set():
+        await _call(session, recorder, "sequence", {"steps": steps, "optimize_steps": False}, len(steps))
+
+
+async def status(session: ClientSession, recorder: Recorder, stop: asyncio.Event) -> None:
+    for i in itertools.count():
+        if stop.is_set():
+            return
+        refresh = i % 10 == 9
+        # refresh sends the 'j' and 'v' queries
+        await _call(session, recorder, "status", {"refresh": refresh}, 2 if refresh else 0)
+        await asyncio.sleep(0.1)
+
+
+PROFILE_FUNCS = {"joystick": joystick, "sequence": sequence, "status": status}
+
+
+# --- transports ---
+
+@asynccontextmanager
+async def inprocess_server(write_latency: float, recorder: Recorder):
+    """Run one server lifespan and yield a factory for in-memory client sessions."""
+    os.environ["BITTLE_MCP_MOCK"] = "1"
+    import bittle_mcp
+
+    server = bittle_mcp.mcp._mcp_server
+    original_lifespan = server.lifespan
+
+    async with bittle_mcp.app_lifespan(bittle_mcp.mcp) as context:
+        conn = context["bittle"]
+        await conn.connect(ADDRESS)
+        # Only tool calls may write: the background reconcile's 'j'/'v' queries
+        # would otherwise count as writes nobody expected
+        context["state"].stop()
+        conn.add_send_listener(recorder.count_write)
+
+        if write_latency > 0:
+            mock_write = conn._write
+
+            async def slow_write(command: str) -> None:
+                await asyncio.sleep(write_latency)
+                await mock_write(command)
+
+            conn._write = slow_write
+
+        @asynccontextmanager
+        async def shared_lifespan(_server):
+            yield context
+
+        # Every session reuses the one lifespan instead of creating its own robot link
+        server.lifespan = shared_lifespan
+        try:
+            yield conn, lambda: create_connected_server_and_client_session(server)
+        finally:
+            server.lifespan = original_lifespan
+
+
+def stdio_session_factory():
+    """Factory for sessions to a fresh `python -m bittle_mcp --mock` process."""
+    params = StdioServerParameters(
+        command=sys.executable, args=["-m", "bittle_mcp", "--mock"], env=dict(os.environ)
+    )
+
+    @asynccontextmanager
+    async def factory():
+        with open(os.devnull, "w") as devnull:
+            async with stdio_client(params, errlog=devnull) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    await session.call_tool("connect", {"address": ADDRESS})
+                    yield session
+
+    return factory
+
+
+async def run_client(factory, profile: str, recorder: Recorder, stop: asyncio.Event) -> None:
+    async with factory() as session:
+        await PROFILE_FUNCS[profile](session, recorder, stop)
+
+
+async def monitor_loop_lag(lags: list[float], stop: asyncio.Event, period: float = 0.05) -> None:
+    """Record how late the event loop wakes up from a fixed sleep."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(period)
+        lags.append(max(0.0, time.perf_counter() - start - period))
+
+
+def transport(args: argparse.Namespace, recorder: Recorder):
+    """The transport context: yields (shared mock connection or None, session factory)."""
+    if args.transport == "inprocess":
+        return inprocess_server(args.write_latency / 1000, recorder)
+
+    @asynccontextmanager
+    async def stdio():
+        yield None, stdio_session_factory()
+
+    return stdio()
+
+
+async def run(args: argparse.Namespace) -> dict:
+    recorder = Recorder()
+    stop = asyncio.Event()
+    lags: list[float] = []
+    all_lags: list[float] = []
+    samples: list[dict] = []
+    profiles = PROFILES if args.profile == "mixed" else (args.profile,)
+    assignment = [profiles[i % len(profiles)] for i in range(args.clients)]
+
+    async with transport(args, recorder) as (conn, factory):
+        rss = _rss_bytes if args.transport == "inprocess" else _children_rss_bytes
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(run_client(factory, p, recorder, stop)) for p in assignment]
+        tasks.append(asyncio.create_task(monitor_loop_lag(lags, stop)))
+
+        while time.perf_counter() - start < args.duration:
+            await asyncio.sleep(min(args.interval, args.duration - (time.perf_counter() - start)))
+            window = recorder.rotate()
+            all_lags.extend(lags)
+            sample = {
+                "t": round(time.perf_counter() - start, 3),
+                "calls": window.calls,
+                "errors": window.errors,
+                "p50_ms": _ms(percentile(window.latencies, 50)),
+                "p99_ms": _ms(percentile(window.latencies, 99)),
+                "loop_lag_p99_ms": _ms(percentile(lags, 99)),
+                "loop_lag_max_ms": _ms(max(lags) if lags else None),
+                "rss_bytes": rss(),
+            }
+            lags.clear()
+            if conn is not None:
+                # The mock keeps every write for tests; clear it so it doesn't read as a leak
+                conn.sent.clear()
+            samples.append(sample)
+            if not args.quiet:
+                print(
+                    f"[{sample['t']:8.1f}s] calls {sample['calls']:6d}  errors {sample['errors']:4d}  "
+                    f"p50 {sample['p50_ms']} ms  p99 {sample['p99_ms']} ms  "
+                    f"lag max {sample['loop_lag_max_ms']} ms  rss {sample['rss_bytes']}",
+                    file=sys.stderr,
+                )
+
+        stop.set()
+        await asyncio.wait(tasks, timeout=max(5.0, args.interval))
+        # Calls cut off below have written some of their commands but will
+        # never be credited with expected writes, so loss can't be computed
+        incomplete = recorder.in_flight
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        recorder.rotate()
+
+    return build_report(args, assignment, recorder, samples, all_lags, conn is not None, incomplete)
+
+
+def build_report(args, assignment, recorder, samples, lags, counts_writes: bool, incomplete: int = 0) -> dict:
+    totals = recorder.totals
+    rss = [s["rss_bytes"] for s in samples if s["rss_bytes"] is not None]
+    lost = totals["expected_writes"] - totals["writes"] if counts_writes and not incomplete else None
+    return {
+        "config": {
+            "transport": args.transport,
+            "clients": args.clients,
+            "profiles": assignment,
+            "duration_s": args.duration,
+            "interval_s": args.interval,
+            "write_latency_ms": args.write_latency,
+            "python": platform.python_version(),
+        },
+        "summary": {
+            "calls": totals["calls"],
+            "errors": totals["errors"],
+            "calls_per_s": round(totals["calls"] / args.duration, 2),
+            "p50_ms": _ms(percentile(recorder.all_latencies, 50)),
+            "p99_ms": _ms(percentile(recorder.all_latencies, 99)),
+            "max_ms": _ms(max(recorder.all_latencies) if recorder.all_latencies else None),
+            "expected_writes": totals["expected_writes"] if counts_writes else None,
+            "writes": totals["writes"] if counts_writes else None,
+            "lost_writes": lost,
+            "incomplete_calls": incomplete,
+            "loop_lag_p99_ms": _ms(percentile(lags, 99)),
+            "loop_lag_max_ms": _ms(max(lags) if lags else None),
+            "rss_start_bytes": rss[0] if rss else None,
+            "rss_end_bytes": rss[-1] if rss else None,
+            "rss_growth_bytes": rss[-1] - rss[0] if len(rss) > 1 else None,
+        },
+        "samples": samples,
+    }
+
+
+COMPARE_KEYS = ("calls_per_s", "errors", "p50_ms", "p99_ms", "lost_writes", "loop_lag_p99_ms", "rss_growth_bytes")
+
+
+def compare(current: dict, baseline: dict) -> str:
+    """Side-by-side summary of two reports."""
+    lines = [f"{'metric':<18}{'baseline':>14}{'current':>14}{'change':>10}"]
+    for key in COMPARE_KEYS:
+        old, new = baseline["summary"].get(key), current["summary"].get(key)
+        change = ""
+        if isinstance(old, (int, float)) and isinstance(new, (int, float)) and old:
+            change = f"{(new - old) / abs(old) * 100:+.1f}%"
+        lines.append(f"{key:<18}{str(old):>14}{str(new):>14}{change:>10}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=4, help="concurrent clients (default 4)")
+    parser.add_argument("--duration", type=float, default=30.0, help="run time in seconds (default 30)")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between samples (default 5)")
+    parser.add_argument("--profile", choices=PROFILES + ("mixed",), default="mixed")
+    parser.add_argument("--transport", choices=("inprocess", "stdio"), default="inprocess")
+    parser.add_argument(
+        "--write-latency", type=float, default=0.0,
+        help="simulated BLE write latency in ms (inprocess only, default 0)",
+    )
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no per-sample progress")
+    args = parser.parse_args()
+
+    # Per-command server logs would dominate the run (and its timing)
+    for name in ("bittle-mcp", "mcp"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    report = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report["summary"], indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(report, json.load(f)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Startup benchmark: time from process spawn to the first tool response.
+
+The MCP client spawns the server for every session, so this is the latency a
+user sees before Bittle does anything. The server runs in mock mode so no
+Bluetooth radio is needed and the number reflects import/startup cost only.
+
+Usage:
+    uv run python benchmarks/startup.py            # 10 runs
+    uv run python benchmarks/startup.py --runs 25
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+
+def server_params() -> StdioServerParameters:
+    """Parameters that launch the server in mock mode with the current interpreter."""
+    env = dict(os.environ)
+    env["BITTLE_MCP_MOCK"] = "1"
+    return StdioServerParameters(
+        command=sys.executable,
+        args=["-m", "bittle_mcp", "--mock"],
+        env=env,
+    )
+
+
+async def time_first_response() -> dict[str, float]:
+    """Spawn one server and time initialize and the first tool call.
+
+    Returns:
+        Dict with "initialize" and "first_tool" durations in seconds, both
+        measured from spawn
+    """
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull:
+        async with stdio_client(server_params(), errlog=devnull) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                initialized = time.perf_counter()
+                await session.call_tool("status", {})
+                first_tool = time.perf_counter()
+    return {"initialize": initialized - start, "first_tool": first_tool - start}
+
+
+def summarize(label: str, samples: list[float]) -> str:
+    """Format min/median/max in milliseconds."""
+    ms = sorted(s * 1000 for s in samples)
+    return (
+        f"{label:<12} min {ms[0]:7.1f} ms   "
+        f"median {statistics.median(ms):7.1f} ms   max {ms[-1]:7.1f} ms"
+    )
+
+
+async def run(runs: int) -> None:
+    results = [await time_first_response() for _ in range(runs)]
+    print(f"Startup benchmark ({runs} runs, mock mode)")
+    print(summarize("initialize", [r["initialize"] for r in results]))
+    print(summarize("first tool", [r["first_tool"] for r in results]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10, help="number of cold starts (default 10)")
+    args = parser.parse_args()
+    asyncio.run(run(args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,43 +7,156 @@ This MCP server exposes tools to:
 - Send pose commands (sit, rest, hello)
 - Play sounds (bark melody)
 - Query status
+- Run choreography in sync across several robots
+- Run routines from a library of routine files
+
+Routines are read from BITTLE_MCP_ROUTINES (default ~/.bittle/routines).
+
+Set BITTLE_MCP_MOCK=1 (or pass --mock) to run against MockBittleConnection
+without a Bluetooth radio, or BITTLE_MCP_MOCK=sim (--sim) for a simulated
+robot that streams telemetry. Set BITTLE_MCP_IO_THREAD=1 (or pass --io-thread) to
+run Bluetooth I/O, the write queue, reaction rules and the heading controller
+on a dedicated thread and event loop.
 """
 
+import argparse
 import asyncio
 import logging
+import os
 import re
 import sys
 from contextlib import asynccontextmanager
 
 from mcp.server.fastmcp import FastMCP
 
-from .commands import COMMANDS, GAITS, DIRECTIONS
-from .bluetooth import BittleConnection
+from .commands import COMMANDS, GAITS, DIRECTIONS, SOUNDS
+from .bluetooth import PRIORITY_TOKENS, BittleConnection, MockBittleConnection
+from .choreography import DEFAULT_PROBES, Choreography
+from .controller import HeadingController
+from .optimizer import Step, optimize
+from .recording import ImuRecorder
+from .routines import RoutineError, RoutineLibrary, library_dir
+from .rules import OPERATORS, Rule, RulesEngine
+from .simulator import SimulatedBittleConnection
+from .state import RobotState
+from .worker import ThreadedBittleConnection
 
-# Configure logging to stderr (CRITICAL: never use stdout with stdio transport)
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    stream=sys.stderr
-)
 logger = logging.getLogger("bittle-mcp")
 
+# Environment variable that switches the server to MockBittleConnection
+MOCK_ENV_VAR = "BITTLE_MCP_MOCK"
+
+# Environment variable that moves Bluetooth I/O onto its own thread
+IO_THREAD_ENV_VAR = "BITTLE_MCP_IO_THREAD"
+
 # Global connection instance
 bittle: BittleConnection | None = None
 
+# Global reaction rules engine, attached to the connection's telemetry
+rules: RulesEngine | None = None
+
+# Global robot state model, following the connection's commands and telemetry
+state: RobotState | None = None
+
+# Global IMU recorder for gait analytics
+recorder: ImuRecorder | None = None
+
+# Global heading controller
+controller: HeadingController | None = None
+
+# Library of routine files, compiled on first use
+routines: RoutineLibrary | None = None
+
+# Extra robots joined for choreography, by name (the main connection is "main")
+fleet: dict[str, BittleConnection] = {}
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def mock_mode_enabled() -> bool:
+    """Check whether the server should use the mock connection."""
+    return _env_flag(MOCK_ENV_VAR) or simulation_enabled()
+
+
+def simulation_enabled() -> bool:
+    """Check whether the mock connection should simulate a moving robot."""
+    return os.environ.get(MOCK_ENV_VAR, "").strip().lower() == "sim"
+
+
+def io_thread_enabled() -> bool:
+    """Check whether Bluetooth I/O should run on a dedicated thread."""
+    return _env_flag(IO_THREAD_ENV_VAR)
+
+
+def _new_connection() -> tuple[BittleConnection, list[str]]:
+    """Create a connection for the configured mode. Returns it and the mode names."""
+    mode = []
+    if simulation_enabled():
+        connection = SimulatedBittleConnection(drift=5.0)
+        mode.append("simulated robot")
+    elif mock_mode_enabled():
+        connection = MockBittleConnection()
+        mode.append("mock mode")
+    else:
+        connection = BittleConnection()
+    if io_thread_enabled():
+        connection = ThreadedBittleConnection(connection)
+        connection.start()
+        mode.append("I/O thread")
+    return connection, mode
+
+
+async def _close_connection(connection: BittleConnection) -> None:
+    if connection.is_connected:
+        await connection.disconnect()
+    if isinstance(connection, ThreadedBittleConnection):
+        connection.close()
+
 
 @asynccontextmanager
 async def app_lifespan(server: FastMCP):
     """Handle server startup and shutdown."""
-    global bittle
-    bittle = BittleConnection()
-    logger.info("Bittle MCP Server started")
+    global bittle, rules, state, recorder, controller, routines
+    bittle, mode = _new_connection()
+    logger.info("Bittle MCP Server started" + (f" ({', '.join(mode)})" if mode else ""))
+    # The reaction path (rules, controller) runs where the I/O does; state and
+    # recording are bookkeeping and stay on the MCP loop
+    if isinstance(bittle, ThreadedBittleConnection):
+        io_connection, io_loop = bittle.inner, bittle.loop
+    else:
+        io_connection, io_loop = bittle, None
+    rules = RulesEngine()
+    rules.attach(io_connection)
+    state = RobotState()
+    state.attach(bittle)
+    state.start()
+    recorder = ImuRecorder()
+    recorder.attach(bittle)
+    controller = HeadingController()
+    controller.attach(io_connection, io_loop)
+    routines = RoutineLibrary(library_dir())
 
     try:
-        yield {"bittle": bittle}
+        yield {
+            "bittle": bittle,
+            "rules": rules,
+            "state": state,
+            "recorder": recorder,
+            "controller": controller,
+            "routines": routines,
+        }
     finally:
-        if bittle and bittle.is_connected:
-            await bittle.disconnect()
+        controller.detach()
+        recorder.detach()
+        state.detach()
+        rules.detach()
+        for robot in fleet.values():
+            await _close_connection(robot)
+        fleet.clear()
+        if bittle:
+            await _close_connection(bittle)
         logger.info("Bittle MCP Server stopped")
 
 
@@ -51,6 +164,86 @@ async def app_lifespan(server: FastMCP):
 mcp = FastMCP("bittle", lifespan=app_lifespan)
 
 
+def _active_motion() -> str | None:
+    """Motion the state model knows to be in effect, for the optimizer.
+
+    None when paused or when no reply has confirmed the motion recently: a
+    stale belief must not drop commands.
+    """
+    if state is None or state.paused or not state.verified:
+        return None
+    return state.motion
+
+
+def _address_error(address: str) -> str | None:
+    """Validate a Bluetooth address: standard MAC (XX:XX:XX:XX:XX:XX) or macOS UUID."""
+    mac_re = re.compile(r"^([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}$")
+    uuid_re = re.compile(
+        r"^[0-9A-Fa-f]{8}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{12}$"
+    )
+    if not mac_re.match(address) and not uuid_re.match(address):
+        return (
+            "Error: Invalid address format. "
+            "Expected MAC (XX:XX:XX:XX:XX:XX) or macOS UUID."
+        )
+    return None
+
+
+def _resolve_steps(steps: list[dict]) -> list[Step] | str:
+    """Turn sequence-style step dicts into Steps, or return an error message.
+
+    Sounds are checked first, then regular commands. The last step gets no delay.
+    """
+    resolved = []
+    for i, step in enumerate(steps):
+        command = step.get("command", "")
+        delay = step.get("delay", 1.0)
+
+        cmd = SOUNDS.get(command.lower()) or COMMANDS.get(command.lower())
+        if cmd is None:
+            valid = ", ".join(sorted(COMMANDS.keys()))
+            return f"Step {i + 1}: Unknown command '{command}'. Valid: {valid}"
+
+        resolved.append(Step(command, cmd, delay))
+
+    resolved[-1].delay = 0.0
+    return resolved
+
+
+async def _perform(steps: list[Step]) -> tuple[list[str], bool]:
+    """Send steps with their delays as a tracked motion job.
+
+    Returns the per-step results and whether an emergency stop cut the run short.
+    """
+    results = []
+
+    async def run_steps() -> None:
+        for step in steps:
+            if step.code:
+                try:
+                    await bittle.send(step.code)
+                    results.append(f"Step {len(results) + 1}: {step.name}")
+                except Exception as e:
+                    results.append(f"Step {len(results) + 1}: Failed ({e})")
+                    break
+
+            if step.delay > 0:
+                await asyncio.sleep(step.delay)
+
+    # Run as a tracked motion job so an emergency stop can cut it short
+    job = asyncio.get_running_loop().create_task(run_steps())
+    bittle.track_motion(job)
+    try:
+        await asyncio.wait([job])
+    finally:
+        job.cancel()
+
+    if job.cancelled():
+        results.append("Interrupted by emergency stop")
+        return results, True
+    return results, False
+
+
 @mcp.tool()
 async def scan(timeout: float = 10.0) -> str:
     """Scan for nearby Bittle devices over Bluetooth LE.
@@ -84,19 +277,14 @@ async def connect(address: str) -> str:
     if bittle is None:
         return "Error: Server not initialized"
 
-    # Validate address format: standard MAC (XX:XX:XX:XX:XX:XX) or macOS UUID
-    mac_re = re.compile(r"^([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}$")
-    uuid_re = re.compile(
-        r"^[0-9A-Fa-f]{8}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{12}$"
-    )
-    if not mac_re.match(address) and not uuid_re.match(address):
-        return (
-            "Error: Invalid address format. "
-            "Expected MAC (XX:XX:XX:XX:XX:XX) or macOS UUID."
-        )
+    error = _address_error(address)
+    if error:
+        return error
 
     try:
         await bittle.connect(address)
+        if state is not None:
+            state.reset()
         return f"Connected to Bittle at {address}"
     except Exception as e:
         logger.error(f"Connection failed: {e}")
@@ -113,26 +301,47 @@ async def disconnect() -> str:
         return "Not connected"
 
     await bittle.disconnect()
+    if state is not None:
+        state.reset()
     return "Disconnected from Bittle"
 
 
 @mcp.tool()
-async def status() -> str:
-    """Get connection status."""
+async def status(refresh: bool = False) -> str:
+    """Get connection status and what Bittle is doing.
+
+    The report comes from the server's local state model (active gait or pose,
+    pause and gyro toggles, last voltage/IMU/joint readings), so it needs no
+    Bluetooth round trip.
+
+    Args:
+        refresh: Query joints and IMU from Bittle first (default False)
+    """
     if bittle is None:
         return "Server not initialized"
 
-    if bittle.is_connected:
-        return f"Connected to {bittle.address}"
-    return "Not connected"
+    if not bittle.is_connected:
+        return "Not connected"
+
+    report = f"Connected to {bittle.address}"
+    if state is None:
+        return report
+
+    if refresh and not await state.reconcile():
+        report += "\n(refresh timed out, showing last known state)"
+    return report + "\n" + state.describe()
 
 
 @mcp.tool()
-async def send(command: str) -> str:
+async def send(command: str, force: bool = False) -> str:
     """Send a command to Bittle.
 
+    Commands that cannot change anything (e.g. sit while already sitting) are
+    skipped unless force is set.
+
     Args:
         command: Command name (rest, sit, walk, trot, crawl, hello, bark, etc.)
+        force: Send even if the command is already in effect (default False)
 
     Available commands:
     - Movement: forward, backward, left, right
@@ -153,6 +362,10 @@ async def send(command: str) -> str:
         valid = ", ".join(sorted(COMMANDS.keys()))
         return f"Unknown command: {command}. Valid commands: {valid}"
 
+    # Rest and pause are never skipped: they double as safety stops
+    if not force and cmd not in PRIORITY_TOKENS and state is not None and state.is_redundant(cmd):
+        return f"Skipped: {command} ({cmd}) is already in effect"
+
     try:
         await bittle.send(cmd)
         return f"Sent: {command} ({cmd})"
@@ -162,12 +375,56 @@ async def send(command: str) -> str:
 
 
 @mcp.tool()
-async def move(direction: str, gait: str = "walk") -> str:
+async def emergency_stop() -> str:
+    """Stop Bittle (and any robots added with add_robot) now: rest, ahead of queued commands.
+
+    Queued commands are dropped, running sequences and the heading controller
+    are cancelled, and the rest command takes the next write slot.
+    """
+    if bittle is None:
+        return "Error: Server not initialized"
+
+    if not bittle.is_connected:
+        return "Error: Not connected to Bittle"
+
+    if controller is not None:
+        controller.stop()
+
+    flushed = bittle.flushed_commands
+    others = [robot for robot in fleet.values() if robot.is_connected]
+    results = await asyncio.gather(
+        bittle.send(COMMANDS["rest"], priority=True),
+        *(robot.send(COMMANDS["rest"], priority=True) for robot in others),
+        return_exceptions=True,
+    )
+    if isinstance(results[0], Exception):
+        logger.error(f"Emergency stop failed: {results[0]}")
+        return f"Emergency stop failed: {results[0]}"
+
+    latency = bittle.stop_latencies[-1] * 1000
+    report = (
+        f"Stopped: rest sent in {latency:.1f} ms, "
+        f"{bittle.flushed_commands - flushed} queued command(s) dropped"
+    )
+    failed = sum(isinstance(result, Exception) for result in results[1:])
+    if others:
+        report += f"\nOther robots: {len(others) - failed} stopped"
+        if failed:
+            report += f", {failed} failed"
+    return report
+
+
+@mcp.tool()
+async def move(direction: str, gait: str = "walk", force: bool = False) -> str:
     """Move Bittle in a direction with specified gait.
 
+    A gait or direction that is already in effect is not sent again unless
+    force is set.
+
     Args:
         direction: Movement direction (forward, backward, left, right)
         gait: Movement gait (walk, trot, crawl). Default: walk
+        force: Send both even if already in effect (default False)
     """
     if bittle is None:
         return "Error: Server not initialized"
@@ -184,10 +441,17 @@ async def move(direction: str, gait: str = "walk") -> str:
     if not dir_cmd:
         return f"Unknown direction: {direction}. Use: forward, backward, left, right"
 
+    # Set gait then direction; the optimizer folds them into a combo token when one exists
+    plan = optimize([
+        Step(gait.lower(), gait_cmd),
+        Step(direction.lower(), dir_cmd),
+    ], active=None if force else _active_motion())
+
     try:
-        # Set gait then direction
-        await bittle.send(gait_cmd)
-        await bittle.send(dir_cmd)
+        for step in plan.steps:
+            await bittle.send(step.code)
+        if plan.writes_saved:
+            return f"Moving: {gait} {direction} ({plan.summary()})"
         return f"Moving: {gait} {direction}"
     except Exception as e:
         logger.error(f"Move failed: {e}")
@@ -207,14 +471,9 @@ async def play_sound(sound: str = "bark") -> str:
     if not bittle.is_connected:
         return "Error: Not connected to Bittle"
 
-    # Predefined sounds
-    sounds = {
-        "bark": "b14,4,17,4,14,4,17,4,14,2",
-    }
-
-    cmd = sounds.get(sound.lower())
+    cmd = SOUNDS.get(sound.lower())
     if cmd is None:
-        valid = ", ".join(sorted(sounds.keys()))
+        valid = ", ".join(sorted(SOUNDS.keys()))
         return f"Unknown sound: {sound}. Valid sounds: {valid}"
 
     try:
@@ -226,12 +485,17 @@ async def play_sound(sound: str = "bark") -> str:
 
 
 @mcp.tool()
-async def sequence(steps: list[dict]) -> str:
+async def sequence(steps: list[dict], optimize_steps: bool = True) -> str:
     """Run a sequence of commands with delays between them.
 
     Each step is a dict with "command" (required) and "delay" in seconds (optional, default 1.0).
     Commands can be any valid send() command name or "bark" for sound.
 
+    Before sending, steps are optimized to save BLE writes: a gait followed by a
+    direction with delay 0 becomes one combo command, re-sending the active gait
+    or pose is skipped, back-to-back pause pairs cancel, and adjacent sounds with
+    delay 0 are played as one melody. Total timing is preserved.
+
     Example steps:
         [
             {"command": "walk_forward", "delay": 2.0},
@@ -245,6 +509,7 @@ async def sequence(steps: list[dict]) -> str:
 
     Args:
         steps: List of step dicts, each with "command" and optional "delay" (seconds to wait after)
+        optimize_steps: Rewrite steps to use fewer writes (default True)
     """
     if bittle is None:
         return "Error: Server not initialized"
@@ -255,32 +520,366 @@ async def sequence(steps: list[dict]) -> str:
     if not steps:
         return "Error: No steps provided"
 
-    sounds = {"bark": "b14,4,17,4,14,4,17,4,14,2"}
-    results = []
+    # Resolve every step up front so the whole list can be optimized
+    resolved = _resolve_steps(steps)
+    if isinstance(resolved, str):
+        return resolved
 
-    for i, step in enumerate(steps):
-        command = step.get("command", "")
-        delay = step.get("delay", 1.0)
+    plan = optimize(resolved, active=_active_motion()) if optimize_steps else None
+    results, interrupted = await _perform(plan.steps if plan else resolved)
+    if interrupted:
+        return "Sequence stopped:\n" + "\n".join(results)
+
+    report = "Sequence complete:\n" + "\n".join(results)
+    if plan and plan.rewrites:
+        report += f"\n{plan.summary()}: " + "; ".join(plan.rewrites)
+    return report
+
+
+@mcp.tool()
+async def run_routine(name: str, params: dict | None = None) -> str:
+    """Run a routine from the routine library.
+
+    Routines are JSON files with steps, repeat loops, parameters and includes
+    of other routines (see the README). Each routine is compiled once into a
+    validated, optimized plan and cached until one of its files changes.
+
+    Args:
+        name: Routine name (file name without .json)
+        params: Values for the routine's parameters (default: its own defaults)
+    """
+    if bittle is None or routines is None:
+        return "Error: Server not initialized"
+
+    if not bittle.is_connected:
+        return "Error: Not connected to Bittle"
+
+    try:
+        routine = routines.load(name, params)
+    except RoutineError as e:
+        return f"Error: {e}"
+
+    results, interrupted = await _perform(routine.plan.steps)
+    title = "stopped" if interrupted else "complete"
+    report = f"Routine {name} {title}:\n" + "\n".join(results)
+    if routine.plan.rewrites:
+        report += f"\n{routine.plan.summary()}"
+    return report
+
+
+@mcp.tool()
+async def list_routines() -> str:
+    """List the routines in the routine library."""
+    if routines is None:
+        return "Error: Server not initialized"
+
+    names = routines.names()
+    if not names:
+        return f"No routines in {routines.directory}"
+    return f"Routines in {routines.directory}:\n" + "\n".join(f"  {name}" for name in names)
 
-        # Resolve command: check sounds first, then regular commands
-        cmd = sounds.get(command.lower()) or COMMANDS.get(command.lower())
-        if cmd is None:
-            valid = ", ".join(sorted(COMMANDS.keys()))
-            results.append(f"Step {i + 1}: Unknown command '{command}'. Valid: {valid}")
-            break
 
-        try:
-            await bittle.send(cmd)
-            results.append(f"Step {i + 1}: {command}")
-        except Exception as e:
-            results.append(f"Step {i + 1}: Failed ({e})")
-            break
+@mcp.tool()
+async def add_robot(name: str, address: str) -> str:
+    """Connect another Bittle for choreography.
+
+    Args:
+        name: Name to refer to the robot by ("main" is the connected Bittle)
+        address: Bluetooth MAC address (or macOS UUID) of the robot
+    """
+    if name == "main" or name in fleet:
+        return f"Error: Robot name '{name}' is already in use"
+
+    error = _address_error(address)
+    if error:
+        return error
+
+    robot, _ = _new_connection()
+    try:
+        await robot.connect(address)
+    except Exception as e:
+        await _close_connection(robot)
+        logger.error(f"Connection failed: {e}")
+        return f"Connection failed: {e}"
+    fleet[name] = robot
+    return f"Added {name} at {address} ({len(fleet) + 1} robots)"
 
-        # Wait between steps (skip delay after the last step)
-        if i < len(steps) - 1 and delay > 0:
-            await asyncio.sleep(delay)
 
-    return "Sequence complete:\n" + "\n".join(results)
+@mcp.tool()
+async def remove_robot(name: str) -> str:
+    """Disconnect a robot added with add_robot.
+
+    Args:
+        name: Robot name
+    """
+    robot = fleet.pop(name, None)
+    if robot is None:
+        return f"Unknown robot: {name}"
+    await _close_connection(robot)
+    return f"Removed {name}"
+
+
+@mcp.tool()
+async def choreograph(steps: list[dict], probes: int = DEFAULT_PROBES) -> str:
+    """Run a sequence on every connected robot in sync.
+
+    Each link's latency is measured first with "?" probes. Every robot then
+    gets its commands early by its own latency, so each step arrives at all
+    robots together. The report gives per-link latency and jitter and the sync
+    error achieved, estimated from the robots' acknowledgements.
+
+    Args:
+        steps: Same format as sequence(): dicts with "command" and optional "delay"
+        probes: Latency probes per robot (default 10)
+    """
+    if bittle is None:
+        return "Error: Server not initialized"
+
+    if not steps:
+        return "Error: No steps provided"
+
+    robots = {"main": bittle, **fleet}
+    offline = [name for name, robot in robots.items() if not robot.is_connected]
+    if offline:
+        return f"Error: Not connected: {', '.join(offline)}"
+
+    resolved = _resolve_steps(steps)
+    if isinstance(resolved, str):
+        return resolved
+
+    show = Choreography(robots)
+    try:
+        await show.calibrate(max(1, probes))
+    except Exception as e:
+        logger.error(f"Calibration failed: {e}")
+        return f"Calibration failed: {e}"
+
+    report = await show.run(resolved)
+    title = "Choreography stopped" if report.failed else "Choreography complete"
+    return f"{title}: {len(resolved)} steps on {len(robots)} robots\n{report.describe()}"
+
+
+@mcp.tool()
+async def install_rule(
+    name: str,
+    event: str,
+    field: str,
+    op: str,
+    threshold: float,
+    command: str,
+    debounce: float = 0.0,
+    cooldown: float = 1.0,
+    edge: bool = True,
+) -> str:
+    """Install a local reaction rule that fires a command when telemetry crosses a threshold.
+
+    Rules run inside the server, so the reaction takes milliseconds instead of
+    an LLM round trip. Installing a rule with an existing name replaces it.
+
+    Example: rest when the battery is low (poll with send("voltage")):
+        install_rule("low_battery", "voltage", "voltage", "<", 6.8, "rest")
+    Example: rest when tilted past 60 degrees (stream with send("stream_gyro")):
+        install_rule("tilt", "gyro", "pitch", "abs>", 60, "rest", debounce=0.2)
+
+    Args:
+        name: Unique rule name
+        event: Telemetry kind: voltage, gyro, joints
+        field: Value to test (voltage: voltage; gyro: yaw, pitch, roll, acc_x, acc_y,
+            acc_z, acc_world_z; joints: j0..j15, or angle for a single-joint reply)
+        op: Comparison: <, <=, >, >=, ==, !=, abs>, abs<
+        threshold: Value to compare against
+        command: Command name to send when the rule fires (see list_commands)
+        debounce: Seconds the condition must hold before firing (default 0)
+        cooldown: Minimum seconds between firings (default 1)
+        edge: Fire once per crossing (True) or on every matching event (False)
+    """
+    if rules is None:
+        return "Error: Server not initialized"
+
+    try:
+        rule = Rule(
+            name=name, event=event, field=field, op=op, threshold=threshold,
+            command=command, debounce=debounce, cooldown=cooldown, edge=edge,
+        )
+    except ValueError as e:
+        return f"Error: {e}"
+
+    rules.install(rule)
+    return f"Installed rule: {rule.describe()}"
+
+
+@mcp.tool()
+async def remove_rule(name: str) -> str:
+    """Remove a reaction rule.
+
+    Args:
+        name: Rule name
+    """
+    if rules is None:
+        return "Error: Server not initialized"
+
+    if not rules.remove(name):
+        return f"Unknown rule: {name}"
+    return f"Removed rule: {name}"
+
+
+@mcp.tool()
+async def list_rules() -> str:
+    """List installed reaction rules with their firing and latency statistics."""
+    if rules is None:
+        return "Error: Server not initialized"
+
+    if not rules.rules:
+        return f"No rules installed. Operators: {', '.join(OPERATORS)}"
+
+    lines = [f"  {rule.describe()}" for rule in rules.rules]
+    return (
+        f"Rules (latency budget {rules.latency_budget * 1000:.0f} ms):\n" + "\n".join(lines)
+    )
+
+
+@mcp.tool()
+async def start_recording(label: str) -> str:
+    """Start recording IMU samples into a named session for gait analysis.
+
+    Bittle must be streaming gyro data (send("stream_gyro")) for samples to arrive.
+    Recording into an existing label replaces that session.
+
+    Args:
+        label: Session name, e.g. "walk" or "trot_speed2"
+    """
+    if recorder is None:
+        return "Error: Server not initialized"
+
+    if recorder.recording is not None:
+        recorder.stop()
+    recorder.start(label)
+    return f"Recording IMU into '{label}'"
+
+
+@mcp.tool()
+async def stop_recording() -> str:
+    """Stop the current IMU recording."""
+    if recorder is None:
+        return "Error: Server not initialized"
+
+    label = recorder.recording
+    if label is None:
+        return "Not recording"
+    count = recorder.stop()
+    return f"Stopped recording '{label}': {count} samples"
+
+
+@mcp.tool()
+async def analyze_gait(labels: list[str] | None = None, window: float = 5.0) -> str:
+    """Compare gait quality across recorded IMU sessions.
+
+    Reports step frequency, regularity, pitch/roll sway (RMS), jitter and a
+    0-100 stability score per session.
+
+    Args:
+        labels: Sessions to analyse (default: all recorded sessions)
+        window: Analysis window in seconds (default 5)
+    """
+    if recorder is None:
+        return "Error: Server not initialized"
+
+    # numpy is optional and slow to import, so load analytics on first use
+    try:
+        from . import analytics
+    except ImportError:
+        return 'Error: numpy not installed. Run: pip install "bittle-mcp[analytics]"'
+
+    names = labels or list(recorder.sessions)
+    missing = [name for name in names if name not in recorder.sessions]
+    if missing:
+        return f"Unknown session(s): {', '.join(missing)}. Recorded: {', '.join(recorder.sessions) or 'none'}"
+    if not names:
+        return "No recorded sessions. Use start_recording() first."
+    if window <= 0:
+        return "Error: window must be positive"
+
+    # Copy the sessions (one may still be recording) and keep the number
+    # crunching off the event loop so BLE notifications keep flowing
+    sessions = {name: list(recorder.sessions[name]) for name in names}
+    summaries = await asyncio.to_thread(analytics.analyze, sessions, window=window)
+    return "Gait analysis:\n" + "\n".join(f"  {s.describe()}" for s in summaries)
+
+
+@mcp.tool()
+async def hold_heading(target: float | None = None, gait: str = "walk", rate: float = 10.0) -> str:
+    """Walk while a host-side controller holds a compass heading.
+
+    A fixed-rate loop reads yaw from the gyro stream and steers left, right or
+    straight to stay on the target heading. Requires gyro streaming
+    (send("stream_gyro")). Tune with tune_controller(), inspect with
+    controller_status().
+
+    Args:
+        target: Heading in degrees (default: the current heading)
+        gait: walk, trot, crawl or run (default walk). Gaits without a combo
+            token for the direction are sent as gait, then direction.
+        rate: Control loop rate in Hz (default 10)
+    """
+    if bittle is None or controller is None:
+        return "Error: Server not initialized"
+
+    if not bittle.is_connected:
+        return "Error: Not connected to Bittle"
+
+    try:
+        heading = controller.start(target, gait=gait, rate=rate)
+    except ValueError as e:
+        return f"Error: {e}"
+    return f"Holding heading {heading:.1f} deg with {gait} at {controller.rate:g} Hz"
+
+
+@mcp.tool()
+async def tune_controller(
+    kp: float | None = None,
+    ki: float | None = None,
+    kd: float | None = None,
+    deadband: float | None = None,
+    pitch_limit: float | None = None,
+) -> str:
+    """Adjust heading controller gains; takes effect on the next tick.
+
+    Args:
+        kp: Proportional gain (negative flips the steering direction)
+        ki: Integral gain
+        kd: Derivative gain
+        deadband: Output (deg) within which Bittle walks straight
+        pitch_limit: |pitch| (deg) that switches to the balance pose
+    """
+    if controller is None:
+        return "Error: Server not initialized"
+
+    updates = {"kp": kp, "ki": ki, "kd": kd, "deadband": deadband, "pitch_limit": pitch_limit}
+    for name, value in updates.items():
+        if value is not None:
+            setattr(controller.gains, name, value)
+    return controller.describe()
+
+
+@mcp.tool()
+async def stop_controller() -> str:
+    """Stop the heading controller (Bittle keeps doing its last command)."""
+    if controller is None:
+        return "Error: Server not initialized"
+
+    if not controller.running:
+        return "Controller not running"
+    controller.stop()
+    return "Controller stopped\n" + controller.describe()
+
+
+@mcp.tool()
+async def controller_status() -> str:
+    """Show heading controller state and loop timing (overruns, jitter)."""
+    if controller is None:
+        return "Error: Server not initialized"
+
+    return controller.describe()
 
 
 @mcp.tool()
@@ -304,8 +903,45 @@ Sounds:
 """
 
 
-def main():
-    """Run the MCP server."""
+def main(argv: list[str] | None = None):
+    """Run the MCP server.
+
+    Args:
+        argv: Command-line arguments (default: sys.argv[1:])
+    """
+    parser = argparse.ArgumentParser(prog="bittle-mcp", description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--mock",
+        action="store_true",
+        help=f"use a mock connection instead of Bluetooth (same as {MOCK_ENV_VAR}=1)",
+    )
+    parser.add_argument(
+        "--io-thread",
+        action="store_true",
+        help=f"run Bluetooth I/O on a dedicated thread (same as {IO_THREAD_ENV_VAR}=1)",
+    )
+    parser.add_argument(
+        "--sim",
+        action="store_true",
+        help=f"use a simulated robot that streams telemetry (same as {MOCK_ENV_VAR}=sim)",
+    )
+    args = parser.parse_args(argv)
+    if args.mock:
+        os.environ[MOCK_ENV_VAR] = "1"
+    if args.sim:
+        os.environ[MOCK_ENV_VAR] = "sim"
+    if args.io_thread:
+        os.environ[IO_THREAD_ENV_VAR] = "1"
+
+    # Configure logging to stderr (CRITICAL: never use stdout with stdio transport).
+    # force: FastMCP() already put a RichHandler on the root logger at import
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        stream=sys.stderr,
+        force=True,
+    )
+
     mcp.run(transport="stdio")
 
 
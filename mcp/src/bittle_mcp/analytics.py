@@ -0,0 +1,197 @@
+"""
+Gait-quality analytics over recorded IMU sessions.
+
+Sessions are resampled to a common rate and cut into fixed-length windows.
+The windows of all sessions are stacked into one array, so every metric is
+computed in a single vectorized NumPy pass however many sessions there are:
+
+- step frequency: FFT peak of the vertical acceleration (pitch if the
+  firmware doesn't print acceleration) within STEP_BAND
+- regularity: share of band power around that peak (1.0 = perfectly periodic)
+- pitch/roll RMS: body sway about the window mean, in degrees
+- jitter: RMS angular rate of pitch and roll, in deg/s
+- stability: 0-100 score that falls as sway and jitter grow
+
+Requires numpy: pip install "bittle-mcp[analytics]"
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .recording import SAMPLE_FIELDS
+
+# Default analysis window length (seconds)
+DEFAULT_WINDOW = 5.0
+
+# Frequency band searched for the step rhythm (Hz)
+STEP_BAND = (0.5, 6.0)
+
+# Sway (deg) and jitter (deg/s) that each halve the stability score on their own
+SWAY_SCALE = 5.0
+JITTER_SCALE = 50.0
+
+# Per-window metrics, averaged per session
+METRICS = ("step_frequency", "regularity", "pitch_rms", "roll_rms", "jitter", "stability")
+
+_PITCH = SAMPLE_FIELDS.index("pitch")
+_ROLL = SAMPLE_FIELDS.index("roll")
+_VERTICAL = SAMPLE_FIELDS.index("acc_world_z")
+
+
+@dataclass
+class GaitSummary:
+    """Aggregated metrics for one recorded session."""
+
+    label: str
+    samples: int
+    duration: float
+    windows: int
+    step_frequency: float
+    regularity: float
+    pitch_rms: float
+    roll_rms: float
+    jitter: float
+    stability: float
+
+    def describe(self) -> str:
+        """Compact one-line summary."""
+        if not self.windows:
+            return f"{self.label}: {self.samples} samples, {self.duration:.1f}s (too short to analyse)"
+        return (
+            f"{self.label}: step {self.step_frequency:.2f} Hz, regularity {self.regularity:.2f}, "
+            f"pitch RMS {self.pitch_rms:.1f} deg, roll RMS {self.roll_rms:.1f} deg, "
+            f"jitter {self.jitter:.1f} deg/s, stability {self.stability:.0f}/100 "
+            f"({self.windows} windows, {self.duration:.1f}s)"
+        )
+
+
+def sample_rate(t: np.ndarray) -> float:
+    """Typical sample rate of a timestamp column (Hz), robust to dropped samples."""
+    dt = np.diff(t)
+    dt = dt[dt > 0]
+    return float(1.0 / np.median(dt)) if dt.size else 0.0
+
+
+def resample(samples: np.ndarray, rate: float) -> np.ndarray:
+    """Linearly resample the pitch, roll and step-signal columns onto a uniform grid.
+
+    Args:
+        samples: (n, len(SAMPLE_FIELDS)) array of recorded samples
+        rate: Target rate (Hz)
+
+    Returns:
+        (m, 3) array of pitch, roll and the step signal
+    """
+    t = samples[:, 0]
+    grid = np.arange(t[0], t[-1], 1.0 / rate)
+    vertical = samples[:, _VERTICAL]
+    use_vertical = np.isfinite(vertical).all() and np.ptp(vertical) > 0
+    signal = vertical if use_vertical else samples[:, _PITCH]
+    return np.column_stack([
+        np.interp(grid, t, samples[:, _PITCH]),
+        np.interp(grid, t, samples[:, _ROLL]),
+        np.interp(grid, t, signal),
+    ])
+
+
+def window_metrics(windows: np.ndarray, rate: float) -> dict[str, np.ndarray]:
+    """Per-window metrics for a batch of windows.
+
+    Args:
+        windows: (n_windows, size, 3) array of pitch, roll, step signal
+        rate: Sample rate of the windows (Hz)
+
+    Returns:
+        Dict of metric name -> (n_windows,) array
+    """
+    n, size, _ = windows.shape
+    pitch, roll, signal = windows[..., 0], windows[..., 1], windows[..., 2]
+
+    pitch_rms = np.sqrt(np.mean((pitch - pitch.mean(axis=1, keepdims=True)) ** 2, axis=1))
+    roll_rms = np.sqrt(np.mean((roll - roll.mean(axis=1, keepdims=True)) ** 2, axis=1))
+    jitter = rate * np.sqrt(
+        np.mean(np.diff(pitch, axis=1) ** 2 + np.diff(roll, axis=1) ** 2, axis=1)
+    )
+
+    detrended = (signal - signal.mean(axis=1, keepdims=True)) * np.hanning(size)
+    power = np.abs(np.fft.rfft(detrended, axis=1)) ** 2
+    freqs = np.fft.rfftfreq(size, 1.0 / rate)
+    band = (freqs >= STEP_BAND[0]) & (freqs <= STEP_BAND[1])
+    band_power = power[:, band]
+    peak = np.argmax(band_power, axis=1)
+
+    # Peak bin and its neighbours (Hann leaks into both)
+    padded = np.pad(band_power, ((0, 0), (1, 1)))
+    rows = np.arange(n)
+    left, centre, right = padded[rows, peak], padded[rows, peak + 1], padded[rows, peak + 2]
+
+    # Parabolic interpolation between bins for sub-bin frequency resolution
+    curvature = left - 2 * centre + right
+    offset = np.divide(0.5 * (left - right), curvature, out=np.zeros(n), where=curvature != 0)
+    step_frequency = freqs[band][peak] + np.clip(offset, -0.5, 0.5) * (rate / size)
+
+    peak_power = left + centre + right
+    total = band_power.sum(axis=1)
+    regularity = np.divide(peak_power, total, out=np.zeros(n), where=total > 0)
+
+    stability = 100.0 / (1.0 + np.hypot(pitch_rms, roll_rms) / SWAY_SCALE + jitter / JITTER_SCALE)
+
+    return {
+        "step_frequency": step_frequency,
+        "regularity": regularity,
+        "pitch_rms": pitch_rms,
+        "roll_rms": roll_rms,
+        "jitter": jitter,
+        "stability": stability,
+    }
+
+
+def analyze(
+    sessions: dict[str, Sequence[Sequence[float]]],
+    window: float = DEFAULT_WINDOW,
+    rate: Optional[float] = None,
+) -> list[GaitSummary]:
+    """Analyse many sessions in one batch.
+
+    Args:
+        sessions: Label -> recorded samples (rows in SAMPLE_FIELDS order)
+        window: Window length in seconds
+        rate: Common analysis rate (Hz); default is the median recorded rate
+
+    Returns:
+        One GaitSummary per session, in input order
+    """
+    arrays = {
+        label: np.asarray(rows, dtype=float).reshape(-1, len(SAMPLE_FIELDS))
+        for label, rows in sessions.items()
+    }
+    if rate is None:
+        rates = [sample_rate(a[:, 0]) for a in arrays.values() if len(a) > 1]
+        rate = float(np.median(rates)) if rates else 0.0
+    size = int(round(window * rate))
+
+    batches, counts = [], []
+    for samples in arrays.values():
+        if size < 4 or len(samples) < 2:
+            counts.append(0)
+            continue
+        uniform = resample(samples, rate)
+        n = len(uniform) // size
+        batches.append(uniform[: n * size].reshape(n, size, 3))
+        counts.append(n)
+
+    metrics = window_metrics(np.concatenate(batches), rate) if sum(counts) else {}
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+
+    summaries = []
+    for i, (label, samples) in enumerate(arrays.items()):
+        duration = float(samples[-1, 0] - samples[0, 0]) if len(samples) > 1 else 0.0
+        lo, hi = bounds[i], bounds[i + 1]
+        means = {
+            name: float(metrics[name][lo:hi].mean()) if counts[i] else float("nan")
+            for name in METRICS
+        }
+        summaries.append(GaitSummary(label, len(samples), duration, counts[i], **means))
+    return summaries
@@ -9,15 +9,20 @@ Connection details:
 - Protocol: UART over BLE
 """
 
+from __future__ import annotations
+
 import asyncio
+import concurrent.futures
 import logging
-from typing import Optional
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Callable, Optional, Union
+
+from .telemetry import TelemetryEvent, TelemetryParser
 
-try:
-    from bleak import BleakClient, BleakScanner
-    BLEAK_AVAILABLE = True
-except ImportError:
-    BLEAK_AVAILABLE = False
+if TYPE_CHECKING:
+    from bleak import BleakClient
 
 logger = logging.getLogger("bittle-mcp.bluetooth")
 
@@ -26,6 +31,106 @@ UART_SERVICE_UUID = "6e400001-b5a3-f393-e0a9-e50e24dcca9e"
 UART_TX_CHAR_UUID = "6e400002-b5a3-f393-e0a9-e50e24dcca9e"  # Write to this
 UART_RX_CHAR_UUID = "6e400003-b5a3-f393-e0a9-e50e24dcca9e"  # Read from this
 
+# Safety tokens (rest, pause) that jump the write queue and flush pending motion
+PRIORITY_TOKENS = frozenset({"d", "p"})
+
+# Expected bound on stop-to-wire latency (seconds); slower stops are logged.
+# A stop waits at most this long for the write slot: a normal write still
+# holding it after that is abandoned (it raises CommandFlushed).
+STOP_LATENCY_BUDGET = 0.1
+
+# Longest a priority write may take once it has the slot (seconds)
+STOP_WRITE_TIMEOUT = 1.0
+
+# Stop-to-wire latencies kept for statistics
+STOP_LATENCY_HISTORY = 100
+
+# Task a send is made on behalf of, when it runs in a task of its own on another
+# loop (see worker.py); a motion job sending its own stop must not cancel itself
+SENDING_TASK: ContextVar[Optional[asyncio.Task]] = ContextVar("bittle_sending_task", default=None)
+
+# A motion job: a task, or a future for a task running on another loop
+MotionJob = Union[asyncio.Task, concurrent.futures.Future]
+
+
+class CommandFlushed(RuntimeError):
+    """A queued command was discarded by an emergency stop before being written."""
+
+
+class _WriteGate:
+    """Serializes writes, letting priority writers go first and flush the queue."""
+
+    def __init__(self):
+        self._busy = False
+        self._priority: deque[asyncio.Future] = deque()
+        self._normal: deque[asyncio.Future] = deque()
+
+    @property
+    def pending(self) -> int:
+        """Writers waiting for the slot."""
+        return len(self._priority) + len(self._normal)
+
+    async def acquire(self, priority: bool) -> None:
+        if not self._busy and not self.pending:
+            self._busy = True
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._priority if priority else self._normal
+        queue.append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            if waiter in queue:
+                queue.remove(waiter)
+            elif waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # The slot was handed to us as we were cancelled: pass it on
+                self.release()
+            raise
+
+    def release(self) -> None:
+        for queue in (self._priority, self._normal):
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self._busy = False
+
+    def flush(self) -> int:
+        """Fail every waiting normal writer. Returns how many were flushed."""
+        flushed = 0
+        while self._normal:
+            waiter = self._normal.popleft()
+            if not waiter.done():
+                waiter.set_exception(CommandFlushed("Flushed by emergency stop"))
+                flushed += 1
+        return flushed
+
+
+def _cancel_job(task: MotionJob) -> None:
+    """Cancel a motion job, from its own loop's thread or any other."""
+    if isinstance(task, asyncio.Task) and task.get_loop() is not asyncio.get_running_loop():
+        task.get_loop().call_soon_threadsafe(task.cancel)
+    else:
+        task.cancel()
+
+
+def _load_bleak():
+    """Import bleak on first use.
+
+    bleak pulls in platform backends (CoreBluetooth, BlueZ/D-Bus, WinRT) that
+    are slow to import, so it is deferred until the first BLE operation
+    instead of being paid on every server start.
+
+    Returns:
+        The bleak module, or None if it is not installed
+    """
+    try:
+        import bleak
+    except ImportError:
+        return None
+    return bleak
+
 
 class BittleConnection:
     """Manages Bluetooth connection to Petoi Bittle."""
@@ -34,6 +139,15 @@ class BittleConnection:
         self._client: Optional[BleakClient] = None
         self._address: Optional[str] = None
         self._connected: bool = False
+        self._parser = TelemetryParser()
+        self._listeners: list[Callable[[TelemetryEvent], None]] = []
+        self._send_listeners: list[Callable[[str], None]] = []
+        self._gate = _WriteGate()
+        self._motion_jobs: set[MotionJob] = set()
+        self.stop_latencies: deque[float] = deque(maxlen=STOP_LATENCY_HISTORY)
+        self.flushed_commands = 0
+        self._inflight: Optional[asyncio.Future] = None  # normal write holding the slot
+        self._evicted: Optional[asyncio.Future] = None
 
     @property
     def is_connected(self) -> bool:
@@ -45,6 +159,37 @@ class BittleConnection:
         """Get connected device address."""
         return self._address
 
+    def add_listener(self, callback: Callable[[TelemetryEvent], None]) -> None:
+        """Subscribe to telemetry events parsed from Bittle's replies.
+
+        Callbacks run synchronously on the event loop inside the notification
+        handler, so they must not block.
+
+        Args:
+            callback: Called with each TelemetryEvent
+        """
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[TelemetryEvent], None]) -> None:
+        """Unsubscribe a telemetry callback."""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def add_send_listener(self, callback: Callable[[str], None]) -> None:
+        """Subscribe to commands after they have been written to Bittle.
+
+        Args:
+            callback: Called with each command (without the trailing newline)
+        """
+        if callback not in self._send_listeners:
+            self._send_listeners.append(callback)
+
+    def remove_send_listener(self, callback: Callable[[str], None]) -> None:
+        """Unsubscribe a send callback."""
+        if callback in self._send_listeners:
+            self._send_listeners.remove(callback)
+
     async def scan(self, timeout: float = 10.0) -> list[dict]:
         """Scan for nearby Bittle devices.
 
@@ -54,12 +199,13 @@ class BittleConnection:
         Returns:
             List of discovered devices with name and address
         """
-        if not BLEAK_AVAILABLE:
+        bleak = _load_bleak()
+        if bleak is None:
             logger.error("bleak not installed")
             return []
 
         logger.info(f"Scanning for Bittle devices ({timeout}s)...")
-        devices = await BleakScanner.discover(timeout=timeout)
+        devices = await bleak.BleakScanner.discover(timeout=timeout)
 
         bittle_devices = []
         for device in devices:
@@ -82,7 +228,8 @@ class BittleConnection:
         Returns:
             True if connected successfully
         """
-        if not BLEAK_AVAILABLE:
+        bleak = _load_bleak()
+        if bleak is None:
             raise RuntimeError("bleak not installed. Run: pip install bleak")
 
         if self._connected:
@@ -90,11 +237,12 @@ class BittleConnection:
 
         logger.info(f"Connecting to {address}...")
 
-        self._client = BleakClient(address)
+        self._client = bleak.BleakClient(address)
         try:
             await self._client.connect(timeout=10.0)
             self._address = address
             self._connected = True
+            self._parser = TelemetryParser()
             logger.info(f"Connected to {address}")
 
             # Set up notification handler for responses
@@ -119,15 +267,112 @@ class BittleConnection:
                 self._connected = False
                 logger.info("Disconnected")
 
-    async def send(self, command: str) -> None:
+    def track_motion(self, task: MotionJob) -> None:
+        """Register a running motion job (sequence, controller) for emergency stops.
+
+        The task is cancelled when a priority command is sent and forgotten
+        when it finishes. It may run on another thread's loop.
+        """
+        self._motion_jobs.add(task)
+        task.add_done_callback(self._motion_jobs.discard)
+
+    async def send(self, command: str, priority: Optional[bool] = None) -> None:
         """Send a command to Bittle.
 
+        Writes go out one at a time in order. A priority command (by default
+        rest and pause, see PRIORITY_TOKENS) instead takes the next write slot,
+        fails every queued normal command with CommandFlushed and cancels the
+        tracked motion jobs.
+
         Args:
             command: Serial command to send (e.g., "ksit", "kwkF")
+            priority: Force priority on/off (default: by token)
+
+        Raises:
+            CommandFlushed: The command was discarded (or its stalled write
+                abandoned) by an emergency stop
+            asyncio.TimeoutError: A priority write took over STOP_WRITE_TIMEOUT
         """
-        if not self._connected or not self._client:
+        if not self.is_connected:
             raise RuntimeError("Not connected to Bittle")
 
+        if priority is None:
+            priority = command.strip() in PRIORITY_TOKENS
+        if priority:
+            await self._send_priority(command)
+        else:
+            await self._gate.acquire(priority=False)
+            try:
+                await self._write_normal(command)
+            finally:
+                self._gate.release()
+
+        self._notify_sent(command)
+
+    async def _write_normal(self, command: str) -> None:
+        # A task of its own, so a stop can abandon it without cancelling the caller
+        write = asyncio.ensure_future(self._write(command))
+        self._inflight = write
+        try:
+            await write
+        except asyncio.CancelledError:
+            if self._evicted is write:
+                raise CommandFlushed("Write abandoned by emergency stop") from None
+            raise
+        finally:
+            self._inflight = None
+
+    async def _send_priority(self, command: str) -> None:
+        start = time.monotonic()
+        flushed = self._gate.flush()
+        self.flushed_commands += flushed
+        senders = (asyncio.current_task(), SENDING_TASK.get())
+        cancelled = 0
+        for task in list(self._motion_jobs):
+            if task not in senders and not task.done():
+                _cancel_job(task)
+                cancelled += 1
+
+        slot = asyncio.ensure_future(self._gate.acquire(priority=True))
+        try:
+            done, _ = await asyncio.wait({slot}, timeout=STOP_LATENCY_BUDGET)
+            if not done and self._inflight is not None and not self._inflight.done():
+                logger.warning(f"Write still in flight after {STOP_LATENCY_BUDGET * 1000:.0f} ms: abandoning it")
+                self._evicted = self._inflight
+                self._inflight.cancel()
+                self.flushed_commands += 1
+            await slot
+        except BaseException:
+            if slot.done() and not slot.cancelled() and slot.exception() is None:
+                self._gate.release()
+            else:
+                slot.cancel()
+            raise
+        try:
+            await asyncio.wait_for(self._write(command), STOP_WRITE_TIMEOUT)
+        finally:
+            self._gate.release()
+
+        latency = time.monotonic() - start
+        self.stop_latencies.append(latency)
+        if flushed or cancelled:
+            logger.info(f"Priority {command.strip()}: flushed {flushed} command(s), cancelled {cancelled} job(s)")
+        if latency > STOP_LATENCY_BUDGET:
+            logger.warning(
+                f"Stop-to-wire latency {latency * 1000:.1f} ms over budget "
+                f"({STOP_LATENCY_BUDGET * 1000:.0f} ms)"
+            )
+
+    def _notify_sent(self, command: str) -> None:
+        sent = command.rstrip("\n")
+        for callback in list(self._send_listeners):
+            try:
+                callback(sent)
+            except Exception as e:
+                logger.warning(f"Send listener failed: {e}")
+
+    async def _write(self, command: str) -> None:
+        """Write one command to the UART TX characteristic."""
         # Add newline if not present (Bittle expects newline-terminated commands)
         if not command.endswith("\n"):
             command = command + "\n"
@@ -144,16 +389,42 @@ class BittleConnection:
     def _notification_handler(self, sender, data: bytearray) -> None:
         """Handle incoming data from Bittle."""
         try:
-            message = data.decode("utf-8").strip()
-            if message:
-                logger.debug(f"Received: {message}")
+            message = data.decode("utf-8")
         except Exception as e:
             logger.warning(f"Failed to decode response: {e}")
+            return
+
+        if message.strip():
+            logger.debug(f"Received: {message.strip()}")
+
+        for event in self._parser.feed(message):
+            self._dispatch(event)
+
+    def _dispatch(self, event: TelemetryEvent) -> None:
+        """Deliver a telemetry event to every listener."""
+        for callback in list(self._listeners):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.warning(f"Telemetry listener failed: {e}")
+
+
+# Canned replies MockBittleConnection gives to query tokens
+MOCK_REPLIES: dict[str, str] = {
+    "j": "=\n" + ",\t".join(str(i) for i in range(16)) + ",\t\n" + ",\t".join("0" * 16) + ",\t\n",
+    "v": "0.00\t0.00\t0.00\t0\t0\t0\t0\n",
+    "P": "Voltage: 7.40 V\n",
+    "?": "Bittle\nB02_250101\n?\n",
+}
 
 
 class MockBittleConnection(BittleConnection):
     """Mock connection for testing without hardware."""
 
+    def __init__(self):
+        super().__init__()
+        self.sent: list[str] = []
+
     async def connect(self, address: str) -> bool:
         if self._connected:
             await self.disconnect()
@@ -161,6 +432,7 @@ class MockBittleConnection(BittleConnection):
         self._address = address
         self._connected = True
         self._client = object()  # sentinel so is_connected returns True
+        self._parser = TelemetryParser()
         return True
 
     async def disconnect(self) -> None:
@@ -168,11 +440,30 @@ class MockBittleConnection(BittleConnection):
         self._client = None
         self._connected = False
 
-    async def send(self, command: str) -> None:
-        if not self._connected or not self._client:
-            raise RuntimeError("Not connected to Bittle")
+    async def _write(self, command: str) -> None:
+        self.sent.append(command)
         logger.info(f"[MOCK] Sent: {command}")
 
+        reply = self._reply_for(command.strip())
+        if reply is not None:
+            self._deliver(reply)
+
+    def _reply_for(self, command: str) -> Optional[str]:
+        """What the firmware prints in answer to a command (None: nothing)."""
+        return MOCK_REPLIES.get(command)
+
+    def _deliver(self, reply: str) -> None:
+        # Answer on the next loop iteration, like a real notification
+        asyncio.get_running_loop().call_soon(self.receive, reply)
+
+    def receive(self, message: str) -> None:
+        """Simulate Bittle sending a reply over the RX characteristic.
+
+        Args:
+            message: Raw text as the firmware would print it (include "\n")
+        """
+        self._notification_handler(None, bytearray(message.encode("utf-8")))
+
     async def scan(self, timeout: float = 10.0) -> list[dict]:
         logger.info("[MOCK] Scanning...")
         return [{"name": "MockBittle", "address": "00:00:00:00:00:00"}]
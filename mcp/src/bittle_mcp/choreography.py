@@ -0,0 +1,236 @@
+"""
+Clock-synchronized choreography across several Bittles.
+
+Each BLE link has its own latency, so the same command sent to every robot
+at once arrives at different times and the dogs drift apart. Choreography
+first probes every link with the '?' query and times the round trip to its
+echoed token. Half the median round trip is the one-way latency; the spread
+of the samples is the jitter. Steps are then placed on one shared timeline
+and each robot's copy is sent early by its own latency, so all copies arrive
+together.
+
+The firmware echoes each command's token when it has taken it, so the
+arrival time of every command can be estimated after the fact: the ack time
+minus the link's latency. The spread of those estimates across robots is
+the achieved sync error. It includes the firmware's own reaction time,
+which differs between commands (gaits ack at once, tricks when finished).
+"""
+
+import asyncio
+import logging
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .bluetooth import BittleConnection
+from .commands import COMMANDS
+from .optimizer import Step
+from .telemetry import TelemetryEvent
+
+logger = logging.getLogger("bittle-mcp.choreography")
+
+# Probes per link and how long to wait for each echo (seconds)
+DEFAULT_PROBES = 10
+PROBE_TIMEOUT = 1.0
+
+# Gap between probes so they don't queue behind each other (seconds)
+PROBE_INTERVAL = 0.02
+
+# Extra time before the first step, on top of the slowest link (seconds)
+LEAD_MARGIN = 0.1
+
+# How long to wait for the last acks after the final step (seconds)
+ACK_TIMEOUT = 1.0
+
+# A command sent later than this after its slot counts as late (seconds)
+LATE_AFTER = 0.01
+
+
+@dataclass
+class LinkEstimate:
+    """One-way latency of a link, measured with '?' probes."""
+
+    latency: float  # median one-way delay (s)
+    jitter: float  # spread of the one-way samples, max - min (s)
+    samples: int
+    lost: int = 0
+
+    def describe(self) -> str:
+        text = f"latency {self.latency * 1000:.1f} ms, jitter {self.jitter * 1000:.1f} ms ({self.samples} probes"
+        return text + (f", {self.lost} lost)" if self.lost else ")")
+
+
+async def probe(
+    connection: BittleConnection,
+    count: int = DEFAULT_PROBES,
+    timeout: float = PROBE_TIMEOUT,
+) -> LinkEstimate:
+    """Estimate a link's one-way latency from '?' round trips.
+
+    Echoes carry no sequence number, so after a probe times out its echo is
+    waited for (up to `timeout` more) before the next probe is sent: a late
+    echo must not complete the next probe's wait and shorten its round trip.
+
+    Raises:
+        RuntimeError: No probe was answered
+    """
+    token = COMMANDS["query"]
+    loop = asyncio.get_running_loop()
+    waiter: Optional[asyncio.Future] = None
+
+    def on_event(event: TelemetryEvent) -> None:
+        if event.kind == "ack" and event.token == token and waiter is not None and not waiter.done():
+            waiter.set_result(event.timestamp)
+
+    samples, lost = [], 0
+    connection.add_listener(on_event)
+    try:
+        for i in range(count):
+            if i:
+                await asyncio.sleep(PROBE_INTERVAL)
+            waiter = loop.create_future()
+            sent_at = time.monotonic()
+            await connection.send(token)
+            try:
+                echoed_at = await asyncio.wait_for(waiter, timeout)
+            except asyncio.TimeoutError:
+                lost += 1
+                # Drain the lost probe's echo (if it comes at all)
+                waiter = loop.create_future()
+                try:
+                    await asyncio.wait_for(waiter, timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            samples.append((echoed_at - sent_at) / 2)
+    finally:
+        connection.remove_listener(on_event)
+
+    if not samples:
+        raise RuntimeError(f"No reply to {count} probes")
+    return LinkEstimate(statistics.median(samples), max(samples) - min(samples), len(samples), lost)
+
+
+@dataclass
+class SyncReport:
+    """Outcome of a choreographed run."""
+
+    steps: list[str]
+    links: dict[str, LinkEstimate]
+    # Estimated arrival per robot and step, relative to the shared timeline (None: no ack)
+    arrivals: dict[str, list[Optional[float]]] = field(default_factory=dict)
+    late: dict[str, int] = field(default_factory=dict)
+    # Robots whose run was cut short, with the reason
+    failed: dict[str, str] = field(default_factory=dict)
+
+    def errors(self) -> list[Optional[float]]:
+        """Per step: spread of the estimated arrivals across robots (None if under two acks)."""
+        errors = []
+        for i in range(len(self.steps)):
+            times = [a[i] for a in self.arrivals.values() if a[i] is not None]
+            errors.append(max(times) - min(times) if len(times) > 1 else None)
+        return errors
+
+    def describe(self) -> str:
+        lines = [f"{name}: {link.describe()}" for name, link in self.links.items()]
+        for name, reason in self.failed.items():
+            lines.append(f"{name}: stopped ({reason})")
+        for name, count in self.late.items():
+            if count:
+                lines.append(f"{name}: {count} step(s) sent late")
+        measured = [e for e in self.errors() if e is not None]
+        if measured:
+            lines.append(
+                f"Sync error: mean {statistics.fmean(measured) * 1000:.1f} ms, "
+                f"max {max(measured) * 1000:.1f} ms over {len(measured)}/{len(self.steps)} steps"
+            )
+        else:
+            lines.append("Sync error: not measured (no acks from two or more robots)")
+        return "\n".join(lines)
+
+
+class Choreography:
+    """Runs the same steps on several robots against one timeline."""
+
+    def __init__(self, robots: dict[str, BittleConnection]):
+        self.robots = robots
+        self.links: dict[str, LinkEstimate] = {}
+
+    async def calibrate(self, probes: int = DEFAULT_PROBES) -> dict[str, LinkEstimate]:
+        """Probe every link concurrently and keep the estimates."""
+        names = list(self.robots)
+        estimates = await asyncio.gather(*(probe(self.robots[name], probes) for name in names))
+        self.links = dict(zip(names, estimates))
+        for name, link in self.links.items():
+            logger.info(f"{name}: {link.describe()}")
+        return self.links
+
+    async def run(self, steps: list[Step], ack_timeout: float = ACK_TIMEOUT) -> SyncReport:
+        """Send `steps` to every robot so that each step arrives everywhere at once.
+
+        Each step's delay is the time until the next step, as in sequence().
+        Call calibrate() first; robots without an estimate are treated as
+        zero-latency.
+        """
+        offsets, offset = [], 0.0
+        for step in steps:
+            offsets.append(offset)
+            offset += step.delay
+
+        slowest = max((link.latency + link.jitter for link in self.links.values()), default=0.0)
+        start = time.monotonic() + slowest + LEAD_MARGIN
+        report = SyncReport([step.name for step in steps], dict(self.links))
+
+        async def perform(name: str, connection: BittleConnection) -> None:
+            latency = self.links[name].latency if name in self.links else 0.0
+            acks = [loop.create_future() for _ in steps]
+            pending: list[int] = []  # sent steps still waiting for their ack
+
+            def on_event(event: TelemetryEvent) -> None:
+                if event.kind != "ack":
+                    return
+                for i in pending:
+                    if steps[i].code[:1] == event.token:
+                        pending.remove(i)
+                        if not acks[i].done():
+                            acks[i].set_result(event.timestamp)
+                        return
+
+            report.late[name] = 0
+            connection.add_listener(on_event)
+            try:
+                for i, step in enumerate(steps):
+                    slot = start + offsets[i] - latency
+                    await asyncio.sleep(max(0.0, slot - time.monotonic()))
+                    if time.monotonic() - slot > LATE_AFTER:
+                        report.late[name] += 1
+                    pending.append(i)
+                    await connection.send(step.code)
+                await asyncio.wait(acks, timeout=ack_timeout)
+            finally:
+                connection.remove_listener(on_event)
+                for ack in acks:
+                    ack.cancel()
+            report.arrivals[name] = [
+                ack.result() - latency - start if ack.done() and not ack.cancelled() else None
+                for ack in acks
+            ]
+
+        loop = asyncio.get_running_loop()
+        jobs = {}
+        for name, connection in self.robots.items():
+            jobs[name] = loop.create_task(perform(name, connection))
+            connection.track_motion(jobs[name])
+        try:
+            await asyncio.wait(jobs.values())
+        finally:
+            for job in jobs.values():
+                job.cancel()
+
+        for name, job in jobs.items():
+            if job.cancelled():
+                report.failed[name] = "interrupted by emergency stop"
+            elif job.exception() is not None:
+                report.failed[name] = str(job.exception())
+        return report
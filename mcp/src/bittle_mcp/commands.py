@@ -50,10 +50,23 @@ COMMANDS: dict[str, str] = {
     "gyro_on": "g",
     "gyro_off": "G",
     "pause": "p",
+
+    # Queries (replies arrive as telemetry)
+    "voltage": "P",
+    "joints": "j",
+    "print_gyro": "v",
+    "stream_gyro": "V",
+    "query": "?",  # model and firmware version
+
     # Custom sounds (note,duration pairs — notes 8-17 are reliably audible)
     "bark": "b14,4,17,4,14,4,17,4,14,2",
 }
 
+# Predefined sounds for play_sound (and usable as sequence steps)
+SOUNDS: dict[str, str] = {
+    "bark": "b14,4,17,4,14,4,17,4,14,2",
+}
+
 # Gaits for movement
 GAITS: dict[str, str] = {
     "walk": "kwk",
@@ -0,0 +1,278 @@
+"""
+Host-side closed-loop heading controller.
+
+The firmware balances itself ('g'/'G') but nothing holds a heading: a
+walking Bittle slowly veers. HeadingController closes that loop on the host.
+At a fixed rate it reads the latest yaw and pitch from the gyro telemetry
+stream, runs a PID on the heading error and turns the output into the
+walking direction (forward, left or right). Commands are sent only when
+the direction changes, as a combo token when COMMANDS has one (kwkL) and
+otherwise as gait then direction (krn, L), through the optimizer. If pitch
+exceeds `pitch_limit` it switches to the balance pose until the robot is
+level again.
+
+Ticks are scheduled against absolute deadlines (no drift from the time the
+step itself takes). Each tick records how late it woke up. A tick that
+wakes more than one period late, or whose step runs past the next deadline,
+counts as an overrun, and the schedule re-anchors instead of bursting to
+catch up.
+
+Positive yaw error turns left: set kp negative if the IMU's yaw sign is the
+other way round.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from .bluetooth import BittleConnection, MotionJob
+from .commands import COMMANDS, DIRECTIONS, GAITS
+from .optimizer import Step, next_motion_state, optimize
+from .telemetry import TelemetryEvent
+
+logger = logging.getLogger("bittle-mcp.controller")
+
+# Samples older than this (seconds) are not used for control
+STALE_AFTER = 0.5
+
+# Ticks kept for jitter statistics
+TIMING_HISTORY = 1000
+
+
+@dataclass
+class Gains:
+    """Tunable controller parameters."""
+
+    kp: float = 1.0
+    ki: float = 0.0
+    kd: float = 0.0
+    deadband: float = 5.0  # output (deg) within which Bittle walks straight
+    pitch_limit: float = 45.0  # |pitch| (deg) that triggers the balance pose
+    integral_limit: float = 30.0  # clamp on the integral term (deg)
+
+
+def wrap_angle(degrees: float) -> float:
+    """Wrap an angle to [-180, 180)."""
+    return (degrees + 180.0) % 360.0 - 180.0
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class HeadingController:
+    """Fixed-rate PID heading hold driven by gyro telemetry."""
+
+    def __init__(self, rate: float = 10.0, gains: Optional[Gains] = None):
+        self.rate = rate
+        self.gains = gains or Gains()
+        self.gait = "walk"
+        self.target: Optional[float] = None
+        self._connection: Optional[BittleConnection] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[MotionJob] = None
+        self._yaw: Optional[float] = None
+        self._pitch = 0.0
+        self._sample_at = 0.0
+        self._reset_stats()
+
+    def _reset_stats(self) -> None:
+        self.ticks = 0
+        self.overruns = 0
+        self.stale_ticks = 0
+        self.commands_sent = 0
+        self.last_error: Optional[float] = None
+        self.last_output: Optional[float] = None
+        self.last_command: Optional[str] = None  # motion the controller last set
+        self._lateness: deque[float] = deque(maxlen=TIMING_HISTORY)
+        self._step_times: deque[float] = deque(maxlen=TIMING_HISTORY)
+        self._integral = 0.0
+        self._previous_error: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the control loop is running."""
+        return self._task is not None and not self._task.done()
+
+    def attach(self, connection: BittleConnection, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """Read telemetry from and send corrections to a connection.
+
+        Args:
+            connection: Connection to control
+            loop: Loop the connection's I/O runs on, if it is not the caller's
+                (the I/O thread's, see worker.py); the control loop runs there
+        """
+        self.detach()
+        self._connection = connection
+        self._loop = loop
+        connection.add_listener(self.on_event)
+
+    def detach(self) -> None:
+        """Stop the loop and the telemetry subscription."""
+        self.stop()
+        if self._connection is not None:
+            self._connection.remove_listener(self.on_event)
+            self._connection = None
+            self._loop = None
+
+    def on_event(self, event: TelemetryEvent) -> None:
+        """Telemetry listener: keep the latest yaw and pitch."""
+        if event.kind == "gyro" and "yaw" in event.values:
+            self._yaw = event.values["yaw"]
+            self._pitch = event.values.get("pitch", 0.0)
+            self._sample_at = event.timestamp
+
+    def start(self, target: Optional[float] = None, gait: str = "walk", rate: Optional[float] = None) -> float:
+        """Start holding a heading.
+
+        Args:
+            target: Heading to hold in degrees (default: the current yaw)
+            gait: Gait to walk with (walk, trot, crawl, run)
+            rate: Control rate in Hz (default: keep the current rate)
+
+        Returns:
+            The target heading
+
+        Raises:
+            ValueError: Unknown gait, non-positive rate, or no yaw reading yet
+        """
+        if gait.lower() not in GAITS:
+            raise ValueError(f"Unknown gait: {gait}. Use: {', '.join(GAITS)}")
+        if rate is not None:
+            if rate <= 0:
+                raise ValueError("rate must be positive")
+            self.rate = rate
+        if target is None:
+            if self._yaw is None:
+                raise ValueError("No yaw reading yet. Stream gyro data first (send stream_gyro)")
+            target = self._yaw
+
+        self.stop()
+        self._reset_stats()
+        self.gait = gait.lower()
+        self.target = wrap_angle(target)
+        if self._loop is None or self._loop is asyncio.get_running_loop():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        else:
+            self._task = asyncio.run_coroutine_threadsafe(self._run(), self._loop)
+        if self._connection is not None:
+            self._connection.track_motion(self._task)
+        logger.info(f"Holding heading {self.target:.1f} deg at {self.rate:g} Hz ({self.gait})")
+        return self.target
+
+    def stop(self) -> None:
+        """Stop the control loop (Bittle keeps its last command)."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.rate
+        deadline = loop.time()
+        while True:
+            deadline += period
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+            woke = loop.time()
+            lateness = woke - deadline
+            self._lateness.append(lateness)
+            if lateness > period:
+                self.overruns += 1
+                deadline = woke
+
+            try:
+                await self._step(period)
+            except Exception as e:
+                logger.error(f"Controller step failed: {e}")
+
+            finished = loop.time()
+            self._step_times.append(finished - woke)
+            if finished > deadline + period:
+                self.overruns += 1
+                deadline = finished
+            self.ticks += 1
+
+    async def _step(self, dt: float) -> None:
+        connection = self._connection
+        if connection is None or not connection.is_connected:
+            return
+        if self._yaw is None or time.monotonic() - self._sample_at > STALE_AFTER:
+            self.stale_ticks += 1
+            return
+
+        gains = self.gains
+        error = wrap_angle(self.target - self._yaw)
+        self._integral = max(-gains.integral_limit, min(gains.integral_limit, self._integral + error * dt))
+        derivative = 0.0 if self._previous_error is None else wrap_angle(error - self._previous_error) / dt
+        self._previous_error = error
+        output = gains.kp * error + gains.ki * self._integral + gains.kd * derivative
+        self.last_error = error
+        self.last_output = output
+
+        if abs(self._pitch) > gains.pitch_limit:
+            steps = [Step("balance", COMMANDS["balance"])]
+        else:
+            if output > gains.deadband:
+                direction = "left"
+            elif output < -gains.deadband:
+                direction = "right"
+            else:
+                direction = "forward"
+            steps = [Step(self.gait, GAITS[self.gait]), Step(direction, DIRECTIONS[direction])]
+
+        motion = self.last_command
+        for step in steps:
+            motion = next_motion_state(motion, step.code)
+        if motion != self.last_command:
+            for step in optimize(steps, active=self.last_command).steps:
+                if step.code:
+                    await connection.send(step.code)
+                    self.commands_sent += 1
+            self.last_command = motion
+
+    def stats(self) -> dict[str, float]:
+        """Loop timing and control statistics (times in milliseconds)."""
+        stats = {
+            "rate_hz": self.rate,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "stale_ticks": self.stale_ticks,
+            "commands_sent": self.commands_sent,
+        }
+        # Copies: the loop may be appending on the I/O thread
+        lateness = [x * 1000 for x in list(self._lateness)]
+        step_times = list(self._step_times)
+        if lateness:
+            stats["jitter_p50_ms"] = _percentile(lateness, 50)
+            stats["jitter_p99_ms"] = _percentile(lateness, 99)
+            stats["jitter_max_ms"] = max(lateness)
+        if step_times:
+            stats["step_max_ms"] = max(step_times) * 1000
+        return stats
+
+    def describe(self) -> str:
+        """Multi-line status for controller_status."""
+        if self.target is None:
+            return "Controller idle (never started)"
+        gains = self.gains
+        lines = [
+            f"Heading hold: {'running' if self.running else 'stopped'}, "
+            f"target {self.target:.1f} deg, gait {self.gait}",
+            f"Gains: kp {gains.kp:g}, ki {gains.ki:g}, kd {gains.kd:g}, "
+            f"deadband {gains.deadband:g}, pitch limit {gains.pitch_limit:g}",
+        ]
+        if self.last_error is not None:
+            lines.append(
+                f"Last error {self.last_error:.1f} deg, output {self.last_output:.1f}, "
+                f"command {self.last_command}"
+            )
+        lines.append(
+            "Timing: " + ", ".join(
+                f"{k} {v:.2f}" if isinstance(v, float) else f"{k} {v}" for k, v in self.stats().items()
+            )
+        )
+        return "\n".join(lines)
@@ -0,0 +1,191 @@
+"""
+Command-stream optimizer.
+
+Every command is a separate GATT write, and the BLE link is slow, so the
+tools run their step lists through optimize() before sending. The rewrites
+only remove writes whose effect the firmware would produce anyway:
+
+- gait + direction with no delay in between -> combo token ("kwk", "F" -> "kwkF"),
+  when that combo exists in COMMANDS
+- a gait, direction, combo or pose that is already active -> dropped, except
+  rest and pause (PRIORITY_TOKENS), which double as safety stops
+- two back-to-back pauses -> dropped ("p" toggles pause, so a pair is a no-op)
+- adjacent melodies with no delay in between -> one "b" token
+
+Delays are preserved: a dropped step's delay is added to the step before it.
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .bluetooth import PRIORITY_TOKENS
+from .commands import COMMANDS, DIRECTIONS, GAITS
+
+# Poses are static: sending one that is already held does nothing
+POSES: dict[str, str] = {
+    name: COMMANDS[name] for name in ("rest", "sit", "stand", "balance", "zero")
+}
+
+# Combo tokens available in COMMANDS, keyed by (gait code, direction code)
+COMBOS: dict[tuple[str, str], str] = {
+    (gait, direction): gait + direction
+    for gait in GAITS.values()
+    for direction in DIRECTIONS.values()
+    if gait + direction in COMMANDS.values()
+}
+
+PAUSE = COMMANDS["pause"]
+
+# Upper bound for a coalesced melody so it stays well inside the firmware buffer
+MAX_MELODY_LEN = 128
+
+# Bump when a rewrite rule changes, so plans cached by routines.py are rebuilt
+OPTIMIZER_VERSION = 2
+
+_NAMES_BY_CODE = {code: name for name, code in COMMANDS.items()}
+_GAIT_CODES = set(GAITS.values())
+_DIRECTION_CODES = set(DIRECTIONS.values())
+_COMBO_PARTS = {combo: parts for parts, combo in COMBOS.items()}
+_POSE_CODES = set(POSES.values())
+
+
+@dataclass
+class Step:
+    """One command write followed by an optional wait.
+
+    An empty code is a wait-only step (left behind when the first step of a
+    list is dropped, so its delay still happens).
+    """
+
+    name: str
+    code: str
+    delay: float = 0.0
+
+
+@dataclass
+class OptimizedPlan:
+    """Result of optimize(): the steps to send and what was rewritten."""
+
+    steps: list[Step]
+    original_writes: int
+    rewrites: list[str] = field(default_factory=list)
+
+    @property
+    def writes(self) -> int:
+        """Number of writes the optimized plan performs."""
+        return sum(1 for step in self.steps if step.code)
+
+    @property
+    def writes_saved(self) -> int:
+        """Writes removed by the optimizer."""
+        return self.original_writes - self.writes
+
+    def summary(self) -> str:
+        """One-line report, e.g. "Optimized: 3 -> 2 writes (1 saved)"."""
+        return f"Optimized: {self.original_writes} -> {self.writes} writes ({self.writes_saved} saved)"
+
+
+def _is_melody(code: str) -> bool:
+    return code.startswith("b") and len(code) > 1
+
+
+def _gait_of(active: Optional[str]) -> Optional[str]:
+    """The gait part of an active code ("kwkF" -> "kwk")."""
+    if active in _COMBO_PARTS:
+        return _COMBO_PARTS[active][0]
+    if active is not None and active[:3] in _GAIT_CODES:
+        return active[:3]
+    return active
+
+
+def next_motion_state(active: Optional[str], code: str) -> Optional[str]:
+    """The motion/pose code in effect after sending `code` while `active` is in effect."""
+    if code in _GAIT_CODES:
+        return active if _gait_of(active) == code else code
+    if code in _DIRECTION_CODES:
+        gait = _gait_of(active)
+        if gait in _GAIT_CODES:
+            return COMBOS.get((gait, code), gait + code)
+        return code
+    if code in _POSE_CODES or code in _COMBO_PARTS:
+        return code
+    if _is_melody(code) or not code:
+        return active
+    # Tricks, pause, gyro and anything unknown leave the robot in an unknown state
+    return None
+
+
+def is_redundant(active: Optional[str], code: str) -> bool:
+    """Whether sending `code` while `active` is in effect would change nothing.
+
+    Rest and pause are never redundant: they are safety stops, and the
+    robot may not be where the model thinks.
+    """
+    if active is None or not code or _is_melody(code) or code in PRIORITY_TOKENS:
+        return False
+    return next_motion_state(active, code) == active
+
+
+def optimize(steps: list[Step], active: Optional[str] = None) -> OptimizedPlan:
+    """Rewrite a step list into an equivalent one with fewer writes.
+
+    Args:
+        steps: Resolved steps in send order
+        active: Motion/pose code known to be in effect before the first step,
+            if any (e.g. "ksit"); None means unknown
+
+    Returns:
+        The optimized plan with a list of human-readable rewrites
+    """
+    out: list[Step] = []
+    rewrites: list[str] = []
+    original = sum(1 for step in steps if step.code)
+
+    def absorb(step: Step, reason: str) -> None:
+        rewrites.append(reason)
+        if out:
+            out[-1].delay += step.delay
+        elif step.delay > 0:
+            out.append(Step("wait", "", step.delay))
+
+    for step in steps:
+        step = Step(step.name, step.code, step.delay)
+        prev = out[-1] if out else None
+        mergeable = prev is not None and prev.code and prev.delay == 0
+
+        # gait + direction -> combo token
+        if mergeable and (prev.code, step.code) in COMBOS:
+            combo = COMBOS[(prev.code, step.code)]
+            rewrites.append(f"merged {prev.name} + {step.name} -> {_NAMES_BY_CODE[combo]}")
+            out[-1] = Step(_NAMES_BY_CODE[combo], combo, step.delay)
+            active = combo
+            continue
+
+        # pause toggled twice in a row does nothing
+        if mergeable and prev.code == PAUSE and step.code == PAUSE and len(out) > 1:
+            out.pop()
+            rewrites.append("dropped paired pause/unpause")
+            out[-1].delay += step.delay
+            active = None
+            continue
+
+        # adjacent melodies play back to back as one
+        if (
+            mergeable
+            and _is_melody(prev.code)
+            and _is_melody(step.code)
+            and len(prev.code) + len(step.code) <= MAX_MELODY_LEN
+        ):
+            rewrites.append(f"coalesced {prev.name} + {step.name}")
+            out[-1] = Step(f"{prev.name}+{step.name}", f"{prev.code},{step.code[1:]}", step.delay)
+            continue
+
+        # re-sending the active gait/direction/pose is a no-op
+        if is_redundant(active, step.code):
+            absorb(step, f"dropped redundant {step.name}")
+            continue
+
+        out.append(step)
+        active = next_motion_state(active, step.code)
+
+    return OptimizedPlan(out, original, rewrites)
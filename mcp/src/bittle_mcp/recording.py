@@ -0,0 +1,67 @@
+"""
+Recording of IMU telemetry into labelled sessions.
+
+ImuRecorder listens to a connection's gyro events and keeps each sample as a
+plain tuple, so recording needs no extra dependencies. The sessions are
+analysed by analytics.py.
+"""
+
+import logging
+import math
+from typing import Optional
+
+from .bluetooth import BittleConnection
+from .telemetry import GYRO_FIELDS, TelemetryEvent
+
+logger = logging.getLogger("bittle-mcp.recording")
+
+# Cap per session (about 4 hours at 50 Hz) so a forgotten recording can't grow forever
+MAX_SAMPLES_PER_SESSION = 720_000
+
+# Column order of a recorded sample: timestamp, then the gyro fields
+SAMPLE_FIELDS = ("t",) + GYRO_FIELDS
+
+
+class ImuRecorder:
+    """Collects gyro telemetry into named sessions."""
+
+    def __init__(self, max_samples: int = MAX_SAMPLES_PER_SESSION):
+        self.max_samples = max_samples
+        self.sessions: dict[str, list[tuple[float, ...]]] = {}
+        self.recording: Optional[str] = None
+        self._connection: Optional[BittleConnection] = None
+
+    def attach(self, connection: BittleConnection) -> None:
+        """Listen to a connection's telemetry."""
+        self.detach()
+        self._connection = connection
+        connection.add_listener(self.on_event)
+
+    def detach(self) -> None:
+        """Stop listening (recorded sessions are kept)."""
+        if self._connection is not None:
+            self._connection.remove_listener(self.on_event)
+            self._connection = None
+
+    def start(self, label: str) -> None:
+        """Start recording into `label`, replacing any session with that label."""
+        self.sessions[label] = []
+        self.recording = label
+
+    def stop(self) -> int:
+        """Stop recording. Returns the number of samples in the stopped session."""
+        label, self.recording = self.recording, None
+        return len(self.sessions.get(label, ())) if label is not None else 0
+
+    def on_event(self, event: TelemetryEvent) -> None:
+        """Telemetry listener: append gyro samples to the active session."""
+        if self.recording is None or event.kind != "gyro":
+            return
+        session = self.sessions[self.recording]
+        if len(session) >= self.max_samples:
+            logger.warning(f"Session {self.recording} reached {self.max_samples} samples, stopping")
+            self.recording = None
+            return
+        session.append(
+            (event.timestamp,) + tuple(event.values.get(name, math.nan) for name in GYRO_FIELDS)
+        )
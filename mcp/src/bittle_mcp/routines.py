@@ -0,0 +1,355 @@
+"""
+Routine files: reusable, parameterised sequences kept in a library directory.
+
+A routine is a JSON file <name>.json in the library directory
+(BITTLE_MCP_ROUTINES, default ~/.bittle/routines):
+
+    {
+      "params": {"laps": 2, "gait": "walk_forward"},
+      "steps": [
+        {"command": "stand", "delay": 0.5},
+        {"repeat": "$laps", "steps": [
+          {"command": "$gait", "delay": 2.0},
+          {"include": "spin", "with": {"turns": 1}}
+        ]},
+        {"command": "sit"}
+      ]
+    }
+
+A step is a command (as in sequence(), "delay" defaults to 1.0), a repeat
+block, or an include of another routine with parameter overrides. A string
+value "$name" is replaced by the parameter of that name. As in sequence(),
+the routine's last step has no delay.
+
+Compiling a routine validates every step, flattens loops and includes into
+one list of Steps and runs the optimizer over it once. Compiled plans are
+cached in memory and in <library>/.cache, keyed by the SHA-256 of every file
+the plan was built from plus the parameters, so editing any of those files
+invalidates the plan. Plans on disk also record a digest of the command
+tables and the compiler/optimizer versions, and every code in them is
+checked against the known commands when read back, so a stale or edited
+cache file is recompiled rather than sent. In memory a file is only
+re-hashed when its size or mtime changes: running a cached routine costs a
+few stat() calls.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+from .commands import COMMANDS, SOUNDS
+from .optimizer import MAX_MELODY_LEN, OPTIMIZER_VERSION, OptimizedPlan, Step, optimize
+
+logger = logging.getLogger("bittle-mcp.routines")
+
+# Environment variable pointing at the routine library directory
+ROUTINES_ENV_VAR = "BITTLE_MCP_ROUTINES"
+
+# Library used when ROUTINES_ENV_VAR is not set
+DEFAULT_LIBRARY = "~/.bittle/routines"
+
+# Compiled plans are stored here, inside the library
+CACHE_DIR = ".cache"
+
+# Bump when the compiled format or compiler semantics change
+CACHE_FORMAT = 1
+
+# Limits that keep a typo (repeat 1e6, an include cycle) from running away
+MAX_STEPS = 10_000
+MAX_INCLUDE_DEPTH = 16
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# What a cached plan was built against; a plan with any other stamp is recompiled
+PLAN_STAMP = hashlib.sha256(
+    json.dumps([CACHE_FORMAT, OPTIMIZER_VERSION, MAX_MELODY_LEN, COMMANDS, SOUNDS], sort_keys=True).encode("utf-8")
+).hexdigest()
+
+_KNOWN_CODES = set(COMMANDS.values()) | set(SOUNDS.values())
+_MELODY_BODIES = {tuple(code[1:].split(",")) for code in _KNOWN_CODES if code.startswith("b") and len(code) > 1}
+
+
+class RoutineError(ValueError):
+    """A routine is missing, malformed or refers to something unknown."""
+
+
+@dataclass
+class CompiledRoutine:
+    """A flattened, validated, optimized routine ready to send."""
+
+    name: str
+    plan: OptimizedPlan
+    sources: dict[str, str]  # routine name -> SHA-256 of its file
+
+    @property
+    def duration(self) -> float:
+        """Total delay in seconds."""
+        return sum(step.delay for step in self.plan.steps)
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "format": PLAN_STAMP,
+            "name": self.name,
+            "sources": self.sources,
+            "steps": [[step.name, step.code, step.delay] for step in self.plan.steps],
+            "original_writes": self.plan.original_writes,
+            "rewrites": self.plan.rewrites,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> "CompiledRoutine":
+        plan = OptimizedPlan(
+            [Step(name, code, delay) for name, code, delay in data["steps"]],
+            data["original_writes"],
+            list(data["rewrites"]),
+        )
+        return cls(data["name"], plan, dict(data["sources"]))
+
+
+def _is_known_melody(code: str) -> bool:
+    """Whether a melody is a known sound or known sounds coalesced by the optimizer."""
+    if not code.startswith("b") or len(code) > MAX_MELODY_LEN:
+        return False
+    notes = tuple(code[1:].split(","))
+    # reachable[i]: notes[:i] splits into known melodies
+    reachable = [True] + [False] * len(notes)
+    for i in range(len(notes)):
+        if reachable[i]:
+            for body in _MELODY_BODIES:
+                if notes[i:i + len(body)] == body:
+                    reachable[i + len(body)] = True
+    return reachable[-1]
+
+
+def check_plan(routine: CompiledRoutine) -> None:
+    """Re-validate a plan that was not compiled in this process.
+
+    Raises:
+        RoutineError: A step would send something that is not a known command
+    """
+    for i, step in enumerate(routine.plan.steps, 1):
+        if step.code and step.code not in _KNOWN_CODES and not _is_known_melody(step.code):
+            raise RoutineError(f"{routine.name} step {i}: unknown code {step.code!r}")
+        if isinstance(step.delay, bool) or not isinstance(step.delay, (int, float)) or step.delay < 0:
+            raise RoutineError(f"{routine.name} step {i}: invalid delay {step.delay!r}")
+
+
+def library_dir() -> Path:
+    """Routine library directory from the environment (or the default)."""
+    return Path(os.environ.get(ROUTINES_ENV_VAR) or DEFAULT_LIBRARY).expanduser()
+
+
+def _fingerprint(path: Path) -> Optional[tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class _Compiler:
+    """Flattens one routine and everything it includes."""
+
+    def __init__(self, library: "RoutineLibrary"):
+        self.library = library
+        self.sources: dict[str, str] = {}
+        self.fingerprints: dict[Path, Optional[tuple[int, int]]] = {}
+        self.total = 0
+
+    def read(self, name: str) -> dict[str, Any]:
+        path = self.library.path(name)
+        self.fingerprints[path] = _fingerprint(path)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            raise RoutineError(f"Unknown routine: {name}") from None
+        self.sources[name] = hashlib.sha256(data).hexdigest()
+        try:
+            doc = json.loads(data)
+        except ValueError as e:
+            raise RoutineError(f"{name}: invalid JSON ({e})") from None
+        if not isinstance(doc, dict):
+            raise RoutineError(f"{name}: expected an object with \"steps\"")
+        return doc
+
+    def routine(self, name: str, overrides: dict[str, Any], stack: tuple[str, ...] = ()) -> list[Step]:
+        if name in stack:
+            raise RoutineError(f"Include cycle: {' -> '.join(stack + (name,))}")
+        if len(stack) >= MAX_INCLUDE_DEPTH:
+            raise RoutineError(f"{name}: includes nested deeper than {MAX_INCLUDE_DEPTH}")
+
+        doc = self.read(name)
+        declared = doc.get("params", {})
+        if not isinstance(declared, dict):
+            raise RoutineError(f"{name}: \"params\" must be an object")
+        unknown = sorted(set(overrides) - set(declared))
+        if unknown:
+            raise RoutineError(f"{name}: unknown parameter(s): {', '.join(unknown)}")
+
+        steps = self.block(doc.get("steps"), {**declared, **overrides}, name, stack + (name,))
+        if not steps:
+            raise RoutineError(f"{name}: no steps")
+        return steps
+
+    def block(self, steps: Any, params: dict[str, Any], where: str, stack: tuple[str, ...]) -> list[Step]:
+        if not isinstance(steps, list):
+            raise RoutineError(f"{where}: \"steps\" must be a list")
+
+        out: list[Step] = []
+        for i, step in enumerate(steps, 1):
+            at = f"{where} step {i}"
+            if not isinstance(step, dict):
+                raise RoutineError(f"{at}: expected an object")
+            kinds = [kind for kind in ("command", "repeat", "include") if kind in step]
+            if len(kinds) != 1:
+                raise RoutineError(f"{at}: needs exactly one of command, repeat, include")
+
+            if "command" in step:
+                out.append(self.command(step, params, at))
+                self.count(1, at)
+            elif "repeat" in step:
+                times = self.value(step["repeat"], params, at)
+                if isinstance(times, bool) or not isinstance(times, int) or times < 0:
+                    raise RoutineError(f"{at}: repeat must be a non-negative integer, got {times!r}")
+                body = self.block(step.get("steps"), params, f"{at} (repeat)", stack)
+                self.count(len(body) * (times - 1), at)
+                out.extend(Step(s.name, s.code, s.delay) for _ in range(times) for s in body)
+            else:
+                include = self.value(step["include"], params, at)
+                overrides = step.get("with", {})
+                if not isinstance(include, str) or not isinstance(overrides, dict):
+                    raise RoutineError(f"{at}: include needs a routine name and an optional \"with\" object")
+                values = {key: self.value(value, params, at) for key, value in overrides.items()}
+                out.extend(self.routine(include, values, stack))
+        return out
+
+    def command(self, step: dict[str, Any], params: dict[str, Any], at: str) -> Step:
+        name = self.value(step["command"], params, at)
+        code = (SOUNDS.get(name.lower()) or COMMANDS.get(name.lower())) if isinstance(name, str) else None
+        if code is None:
+            raise RoutineError(f"{at}: Unknown command '{name}'")
+        delay = self.value(step.get("delay", 1.0), params, at)
+        if isinstance(delay, bool) or not isinstance(delay, (int, float)) or delay < 0:
+            raise RoutineError(f"{at}: delay must be a non-negative number, got {delay!r}")
+        return Step(name, code, float(delay))
+
+    def value(self, value: Any, params: dict[str, Any], at: str) -> Any:
+        if isinstance(value, str) and value.startswith("$"):
+            if value[1:] not in params:
+                raise RoutineError(f"{at}: unknown parameter {value}")
+            return params[value[1:]]
+        return value
+
+    def count(self, added: int, at: str) -> None:
+        self.total += added
+        if self.total > MAX_STEPS:
+            raise RoutineError(f"{at}: routine expands to more than {MAX_STEPS} steps")
+
+
+class RoutineLibrary:
+    """Loads routines by name, compiling each (routine, params) once."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self._memory: dict[tuple[str, str], tuple[CompiledRoutine, dict[Path, Optional[tuple[int, int]]]]] = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.compiles = 0
+
+    def path(self, name: str) -> Path:
+        """File of a routine. Raises RoutineError for names that aren't plain file stems."""
+        if not _NAME_RE.match(name):
+            raise RoutineError(f"Invalid routine name: {name!r} (use letters, digits, - and _)")
+        return self.directory / f"{name}.json"
+
+    def names(self) -> list[str]:
+        """Routines in the library, sorted."""
+        if not self.directory.is_dir():
+            return []
+        return sorted(p.stem for p in self.directory.glob("*.json") if _NAME_RE.match(p.stem))
+
+    def load(self, name: str, params: Optional[dict[str, Any]] = None) -> CompiledRoutine:
+        """Compiled plan for a routine, from memory, disk or a fresh compile.
+
+        Raises:
+            RoutineError: The routine (or an include) is missing or invalid
+        """
+        params = params or {}
+        try:
+            params_key = json.dumps(params, sort_keys=True)
+        except TypeError:
+            raise RoutineError("Parameters must be JSON values") from None
+        key = (name, params_key)
+
+        cached = self._memory.get(key)
+        if cached is not None:
+            routine, fingerprints = cached
+            if all(_fingerprint(path) == fp for path, fp in fingerprints.items()):
+                self.memory_hits += 1
+                return routine
+
+        routine, fingerprints = self._load_disk(name, params_key)
+        if routine is not None:
+            self.disk_hits += 1
+        else:
+            compiler = _Compiler(self)
+            steps = compiler.routine(name, params)
+            steps[-1].delay = 0.0
+            routine = CompiledRoutine(name, optimize(steps), compiler.sources)
+            fingerprints = compiler.fingerprints
+            self.compiles += 1
+            self._save_disk(routine, params_key)
+
+        self._memory[key] = (routine, fingerprints)
+        return routine
+
+    def _cache_path(self, name: str, root_hash: str, params_key: str) -> Path:
+        return self.directory / CACHE_DIR / f"{name}.{root_hash[:16]}.{_digest(params_key)[:16]}.json"
+
+    def _load_disk(
+        self, name: str, params_key: str
+    ) -> tuple[Optional[CompiledRoutine], Optional[dict[Path, Optional[tuple[int, int]]]]]:
+        # Stat before hashing so a write racing with us shows up as a change next time
+        fingerprints = {self.path(name): _fingerprint(self.path(name))}
+        try:
+            root_hash = hashlib.sha256(self.path(name).read_bytes()).hexdigest()
+            data = json.loads(self._cache_path(name, root_hash, params_key).read_text())
+            if data.get("format") != PLAN_STAMP:
+                return None, None
+            for source, digest in data["sources"].items():
+                path = self.path(source)
+                fingerprints[path] = _fingerprint(path)
+                if hashlib.sha256(path.read_bytes()).hexdigest() != digest:
+                    return None, None
+            routine = CompiledRoutine.from_json(data)
+            check_plan(routine)
+            return routine, fingerprints
+        except RoutineError as e:
+            logger.warning(f"Ignoring cached plan: {e}")
+            return None, None
+        except (OSError, ValueError, KeyError, TypeError):
+            return None, None
+
+    def _save_disk(self, routine: CompiledRoutine, params_key: str) -> None:
+        root_hash = routine.sources[routine.name]
+        path = self._cache_path(routine.name, root_hash, params_key)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            # Plans built from an older version of this routine can't be hit again
+            for stale in path.parent.glob(f"{routine.name}.*.json"):
+                if stale.name.split(".")[1] != root_hash[:16]:
+                    stale.unlink(missing_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(routine.to_json()))
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not cache routine {routine.name}: {e}")
@@ -0,0 +1,223 @@
+"""
+Local reaction rules driven by telemetry events.
+
+Reacting to robot state through the MCP tools costs a full LLM round trip.
+The RulesEngine instead listens to the parsed telemetry stream of a
+BittleConnection and sends a command as soon as a rule's condition holds,
+e.g. rest when the voltage drops below 6.8 V or rest when pitch exceeds 60°.
+
+A rule fires when:
+- an event of its kind carries the field and the comparison holds,
+- the comparison has held continuously for `debounce` seconds,
+- (edge rules) it was false on an earlier event, i.e. it fires once per
+  crossing and re-arms when the condition clears,
+- at least `cooldown` seconds passed since the rule last fired.
+"""
+
+import asyncio
+import logging
+import operator
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from .bluetooth import BittleConnection
+from .commands import COMMANDS
+from .telemetry import GYRO_FIELDS, TelemetryEvent
+
+logger = logging.getLogger("bittle-mcp.rules")
+
+# Comparison operators a rule may use; "abs>"/"abs<" compare the magnitude
+OPERATORS: dict[str, Callable[[float, float], bool]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "abs>": lambda value, threshold: abs(value) > threshold,
+    "abs<": lambda value, threshold: abs(value) < threshold,
+}
+
+# Fields each event kind can carry, i.e. what a rule may test; "ack" and
+# "text" events carry no values, so no rule on them could ever fire
+RULE_FIELDS: dict[str, tuple[str, ...]] = {
+    "voltage": ("voltage",),
+    "gyro": GYRO_FIELDS,
+    "joints": tuple(f"j{i}" for i in range(16)) + ("angle",),
+}
+
+# Default time allowed from event receipt to the command being written (seconds)
+DEFAULT_LATENCY_BUDGET = 0.05
+
+
+@dataclass
+class Rule:
+    """A declarative reaction: when `event.values[field] op threshold`, send `command`."""
+
+    name: str
+    event: str
+    field: str
+    op: str
+    threshold: float
+    command: str
+    debounce: float = 0.0
+    cooldown: float = 1.0
+    edge: bool = True
+    enabled: bool = True
+
+    # Runtime state
+    fire_count: int = 0
+    last_fired: Optional[float] = None
+    last_latency: Optional[float] = None
+    budget_misses: int = 0
+    _held_since: Optional[float] = field(default=None, repr=False)
+    _armed: bool = field(default=True, repr=False)
+
+    def __post_init__(self):
+        if self.event not in RULE_FIELDS:
+            raise ValueError(f"Unknown event: {self.event}. Use: {', '.join(RULE_FIELDS)}")
+        if self.field not in RULE_FIELDS[self.event]:
+            raise ValueError(
+                f"Unknown field for {self.event}: {self.field}. Use: {', '.join(RULE_FIELDS[self.event])}"
+            )
+        if self.op not in OPERATORS:
+            raise ValueError(f"Unknown operator: {self.op}. Use: {', '.join(OPERATORS)}")
+        if self.command.lower() not in COMMANDS:
+            raise ValueError(f"Unknown command: {self.command}")
+        if self.debounce < 0 or self.cooldown < 0:
+            raise ValueError("debounce and cooldown must be >= 0")
+        self.command = self.command.lower()
+
+    def evaluate(self, event: TelemetryEvent) -> bool:
+        """Update the rule's state with an event and report whether it should fire."""
+        value = event.values.get(self.field)
+        if value is None:
+            return False
+
+        now = event.timestamp
+        if not OPERATORS[self.op](value, self.threshold):
+            self._held_since = None
+            self._armed = True
+            return False
+
+        if self._held_since is None:
+            self._held_since = now
+        if now - self._held_since < self.debounce:
+            return False
+        if self.edge and not self._armed:
+            return False
+        if self.last_fired is not None and now - self.last_fired < self.cooldown:
+            return False
+
+        self._armed = False
+        self.last_fired = now
+        return True
+
+    def describe(self) -> str:
+        """One-line summary for list_rules."""
+        state = "on" if self.enabled else "off"
+        mode = "edge" if self.edge else "level"
+        latency = (
+            f", last latency {self.last_latency * 1000:.1f} ms" if self.last_latency is not None else ""
+        )
+        return (
+            f"{self.name} [{state}]: {self.event}.{self.field} {self.op} {self.threshold:g} "
+            f"-> {self.command} ({mode}, debounce {self.debounce:g}s, cooldown {self.cooldown:g}s; "
+            f"fired {self.fire_count}x{latency}, budget misses {self.budget_misses})"
+        )
+
+
+class RulesEngine:
+    """Evaluates rules against a connection's telemetry and sends their commands."""
+
+    def __init__(self, latency_budget: float = DEFAULT_LATENCY_BUDGET):
+        self.latency_budget = latency_budget
+        self._rules: dict[str, Rule] = {}
+        self._by_event: dict[str, list[Rule]] = {}
+        self._connection: Optional[BittleConnection] = None
+        self._pending: set[asyncio.Task] = set()
+
+    @property
+    def rules(self) -> list[Rule]:
+        """Installed rules in installation order."""
+        return list(self._rules.values())
+
+    def attach(self, connection: BittleConnection) -> None:
+        """Start listening to a connection's telemetry (detaching from any previous one)."""
+        self.detach()
+        self._connection = connection
+        connection.add_listener(self.on_event)
+
+    def detach(self) -> None:
+        """Stop listening and cancel in-flight sends."""
+        if self._connection is not None:
+            self._connection.remove_listener(self.on_event)
+            self._connection = None
+        for task in list(self._pending):
+            # Sends run on the connection's loop, which may be the I/O thread's
+            if not task.get_loop().is_closed():
+                task.get_loop().call_soon_threadsafe(task.cancel)
+        self._pending.clear()
+
+    # on_event may run on the I/O thread (see worker.py): install and remove
+    # replace the per-event lists instead of mutating one being iterated
+
+    def install(self, rule: Rule) -> None:
+        """Add a rule, replacing any existing rule with the same name."""
+        self.remove(rule.name)
+        self._rules[rule.name] = rule
+        self._by_event[rule.event] = [*self._by_event.get(rule.event, ()), rule]
+
+    def remove(self, name: str) -> bool:
+        """Remove a rule by name. Returns True if it existed."""
+        rule = self._rules.pop(name, None)
+        if rule is None:
+            return False
+        self._by_event[rule.event] = [r for r in self._by_event[rule.event] if r is not rule]
+        return True
+
+    def on_event(self, event: TelemetryEvent) -> None:
+        """Telemetry listener: evaluate matching rules and dispatch their commands."""
+        for rule in self._by_event.get(event.kind, ()):
+            if rule.enabled and rule.evaluate(event):
+                self._fire(rule, event)
+
+    def _fire(self, rule: Rule, event: TelemetryEvent) -> None:
+        connection = self._connection
+        if connection is None or not connection.is_connected:
+            return
+        rule.fire_count += 1
+        logger.info(f"Rule {rule.name} fired on {event.raw!r} -> {rule.command}")
+        task = asyncio.get_running_loop().create_task(self._send(rule, event, connection))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _send(self, rule: Rule, event: TelemetryEvent, connection: BittleConnection) -> None:
+        try:
+            await connection.send(COMMANDS[rule.command])
+        except Exception as e:
+            logger.error(f"Rule {rule.name} send failed: {e}")
+            return
+        rule.last_latency = time.monotonic() - event.timestamp
+        if rule.last_latency > self.latency_budget:
+            rule.budget_misses += 1
+            logger.warning(
+                f"Rule {rule.name} exceeded latency budget: "
+                f"{rule.last_latency * 1000:.1f} ms > {self.latency_budget * 1000:.1f} ms"
+            )
+
+    async def drain(self) -> None:
+        """Wait for all in-flight rule sends to finish, on whichever loop they run."""
+        pending = list(self._pending)
+        if not pending:
+            return
+        loop = pending[0].get_loop()
+        if loop is asyncio.get_running_loop():
+            await asyncio.gather(*pending, return_exceptions=True)
+        else:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_wait_all(pending), loop))
+
+
+async def _wait_all(tasks: list[asyncio.Task]) -> None:
+    await asyncio.gather(*tasks, return_exceptions=True)
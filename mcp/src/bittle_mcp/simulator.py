@@ -0,0 +1,103 @@
+"""
+Simulated Bittle for closed-loop testing without hardware.
+
+SimulatedBittleConnection extends MockBittleConnection with a tiny model of
+the robot: walking turns (L/R) change yaw at `turn_rate`, walking straight
+drifts at `drift` (real dogs veer), and poses stand still. While connected
+it streams gyro telemetry at `telemetry_rate` like 'V' verbose printing, so
+anything that listens to telemetry (rules, state, controller) sees a live
+device. Writes and replies are delayed by a per-link latency and jitter
+(the link is symmetric), each command's arrival time at the "robot" is
+recorded, and every command is acknowledged by echoing its token like the
+firmware does.
+"""
+
+import asyncio
+import random
+import time
+from typing import Optional
+
+from .bluetooth import MockBittleConnection
+from .commands import DIRECTIONS, GAITS
+from .optimizer import COMBOS
+
+
+class SimulatedBittleConnection(MockBittleConnection):
+    """Mock connection backed by a simple heading model and telemetry stream."""
+
+    def __init__(
+        self,
+        telemetry_rate: float = 50.0,
+        turn_rate: float = 30.0,
+        drift: float = 0.0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        super().__init__()
+        self.telemetry_rate = telemetry_rate
+        self.turn_rate = turn_rate
+        self.drift = drift
+        self.latency = latency
+        self.jitter = jitter
+        self.yaw = 0.0
+        self.pitch = 0.0
+        self.roll = 0.0
+        self.heading_rate = 0.0
+        self.arrivals: list[tuple[str, float]] = []
+        self._random = random.Random(seed)
+        self._task: Optional[asyncio.Task] = None
+
+    async def connect(self, address: str) -> bool:
+        await super().connect(address)
+        self._task = asyncio.get_running_loop().create_task(self._stream())
+        return True
+
+    async def disconnect(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await super().disconnect()
+
+    def link_delay(self) -> float:
+        """One-way delay for the next message (latency plus uniform jitter)."""
+        return self.latency + self._random.uniform(0.0, self.jitter)
+
+    async def _write(self, command: str) -> None:
+        delay = self.link_delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.arrivals.append((command, time.monotonic()))
+        self._apply(command)
+        await super()._write(command)
+
+    def _reply_for(self, command: str) -> Optional[str]:
+        return super()._reply_for(command) or f"{command[:1]}\n"
+
+    def _deliver(self, reply: str) -> None:
+        asyncio.get_running_loop().call_later(self.link_delay(), self.receive, reply)
+
+    def _apply(self, command: str) -> None:
+        """Update the heading model for a command arriving at the robot."""
+        direction = command[-1:]
+        # Only tokens the firmware knows: gait+direction strings without a combo do nothing
+        is_motion = command in DIRECTIONS.values() or command in COMBOS.values()
+        if is_motion:
+            self.heading_rate = {
+                "L": self.turn_rate + self.drift,
+                "R": -self.turn_rate + self.drift,
+            }.get(direction, self.drift)
+        elif command in GAITS.values():
+            self.heading_rate = self.drift
+        elif command.startswith("k") or command in ("d", "p"):
+            self.heading_rate = 0.0
+
+    async def _stream(self) -> None:
+        period = 1.0 / self.telemetry_rate
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(period)
+            now = time.monotonic()
+            self.yaw = (self.yaw + self.heading_rate * (now - last) + 180.0) % 360.0 - 180.0
+            last = now
+            self.receive(f"{self.yaw:.2f}\t{self.pitch:.2f}\t{self.roll:.2f}\n")
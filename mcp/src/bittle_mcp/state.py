@@ -0,0 +1,260 @@
+"""
+Local model of the robot's state.
+
+RobotState follows every command written to the connection and every reply
+parsed from it, so the server knows the active gait or pose, the gyro and
+pause toggles, and the latest voltage, IMU and joint readings without asking
+the robot. Tools use it to skip commands that cannot change anything (e.g.
+"sit" while already sitting) and to answer status from memory.
+
+The model is reconciled against the robot every RECONCILE_INTERVAL seconds
+by querying joints ('j') and the IMU ('v'). The believed motion is cleared
+(unknown, so nothing is skipped) when a reading contradicts it:
+
+- the robot has tipped over (any gyro reading, not only reconciles)
+- a pose is believed held but the joints moved away from the angles first
+  seen in that pose (firmware auto-rest, a dropped write, picked up)
+- a gait is believed active but two readings in a row show the same angles
+  (the robot stopped walking)
+
+Motion that no command or reconcile has confirmed for UNVERIFIED_AFTER
+seconds is no longer trusted for skipping commands.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from .bluetooth import BittleConnection
+from .commands import COMMANDS
+from .optimizer import POSES, is_redundant, next_motion_state
+from .telemetry import TelemetryEvent
+
+logger = logging.getLogger("bittle-mcp.state")
+
+# Seconds between background reconciliation queries
+RECONCILE_INTERVAL = 30.0
+
+# Roll or pitch (degrees) beyond which the robot is treated as fallen over
+FALLEN_ANGLE = 75.0
+
+# Largest joint difference (degrees) still counted as the same pose
+POSE_TOLERANCE = 10.0
+
+# Largest joint difference (degrees) between two readings of a standing robot
+STILL_TOLERANCE = 2.0
+
+# Seconds after which unconfirmed motion is not used to skip commands
+UNVERIFIED_AFTER = 2 * RECONCILE_INTERVAL
+
+# Tokens that only ask for data and never change the robot's state
+QUERY_TOKENS = {"j", "v", "V", "P", "?"}
+
+_NAMES_BY_CODE = {code: name for name, code in COMMANDS.items()}
+_POSE_CODES = set(POSES.values())
+
+
+def _joint_difference(a: list[float], b: list[float]) -> float:
+    if len(a) != len(b):
+        return float("inf")
+    return max((abs(x - y) for x, y in zip(a, b)), default=0.0)
+
+
+def _age(since: Optional[float]) -> str:
+    if since is None:
+        return "never"
+    return f"{time.monotonic() - since:.0f}s ago"
+
+
+class RobotState:
+    """Tracks what the robot is doing from sent commands and parsed replies."""
+
+    def __init__(self):
+        self._connection: Optional[BittleConnection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._joints_seen = asyncio.Event()
+        self._imu_seen = asyncio.Event()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything (e.g. after connecting to a different robot)."""
+        self.motion: Optional[str] = None
+        self.paused: bool = False
+        self.gyro: Optional[bool] = None
+        self.voltage: Optional[float] = None
+        self.imu: dict[str, float] = {}
+        self.joints: Optional[list[float]] = None
+        self.last_command: Optional[str] = None
+        self.commanded_at: Optional[float] = None
+        self.telemetry_at: Optional[float] = None
+        self.reconciled_at: Optional[float] = None
+        self.verified_at: Optional[float] = None
+        self._motion_since: Optional[float] = None
+        # Joint angles first seen in each pose, and the last reconcile reading
+        self._pose_joints: dict[str, list[float]] = {}
+        self._previous: Optional[tuple[float, list[float]]] = None
+
+    def attach(self, connection: BittleConnection) -> None:
+        """Follow a connection's sent commands and telemetry."""
+        self.detach()
+        self._connection = connection
+        connection.add_send_listener(self.on_sent)
+        connection.add_listener(self.on_event)
+
+    def detach(self) -> None:
+        """Stop following the connection and the reconcile loop."""
+        self.stop()
+        if self._connection is not None:
+            self._connection.remove_send_listener(self.on_sent)
+            self._connection.remove_listener(self.on_event)
+            self._connection = None
+
+    def on_sent(self, code: str) -> None:
+        """Send listener: apply a command's effect to the model."""
+        self.last_command = code
+        self.commanded_at = time.monotonic()
+
+        if code in QUERY_TOKENS:
+            return
+        if code == COMMANDS["pause"]:
+            self.paused = not self.paused
+        elif code == COMMANDS["gyro_on"]:
+            self.gyro = True
+        elif code == COMMANDS["gyro_off"]:
+            self.gyro = False
+        else:
+            motion = next_motion_state(self.motion, code)
+            if motion != self.motion:
+                self._motion_since = self.commanded_at
+            self.motion = motion
+        self.verified_at = self.commanded_at
+
+    def on_event(self, event: TelemetryEvent) -> None:
+        """Telemetry listener: record readings and reconcile the motion."""
+        if event.kind == "voltage":
+            self.voltage = event.values["voltage"]
+        elif event.kind == "gyro":
+            self.imu = dict(event.values)
+            tilt = max(abs(self.imu.get("pitch", 0.0)), abs(self.imu.get("roll", 0.0)))
+            if tilt > FALLEN_ANGLE and self.motion is not None:
+                logger.info(f"Tilt {tilt:.0f} deg: robot has fallen, motion now unknown")
+                self.motion = None
+            self._imu_seen.set()
+        elif event.kind == "joints" and "j0" in event.values:
+            self.joints = [event.values[f"j{i}"] for i in range(len(event.values))]
+            self._joints_seen.set()
+        else:
+            return
+        self.telemetry_at = event.timestamp
+
+    def is_redundant(self, code: str) -> bool:
+        """Whether sending `code` now would change nothing on the robot."""
+        if self.paused:
+            return False
+        if not self.verified:
+            return False
+        return is_redundant(self.motion, code)
+
+    @property
+    def verified(self) -> bool:
+        """Whether a command or reconcile confirmed the motion recently enough to trust it."""
+        return self.verified_at is not None and time.monotonic() - self.verified_at <= UNVERIFIED_AFTER
+
+    async def reconcile(self, timeout: float = 1.0) -> bool:
+        """Query joints and IMU and wait for both replies.
+
+        Args:
+            timeout: Seconds to wait for the replies
+
+        Returns:
+            True if both replies arrived in time
+        """
+        connection = self._connection
+        if connection is None or not connection.is_connected:
+            return False
+
+        self._joints_seen.clear()
+        self._imu_seen.clear()
+        await connection.send("j")
+        await connection.send("v")
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(self._joints_seen.wait(), self._imu_seen.wait()), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.debug("Reconcile timed out")
+            return False
+        self.reconciled_at = time.monotonic()
+        self._verify(self.reconciled_at)
+        return True
+
+    def _verify(self, now: float) -> None:
+        """Check the believed motion against a fresh joint reading."""
+        joints, previous = self.joints, self._previous
+        self._previous = (now, joints)
+        if self.motion is None or self.paused or joints is None:
+            return
+
+        if self.motion in _POSE_CODES:
+            reference = self._pose_joints.setdefault(self.motion, joints)
+            if _joint_difference(reference, joints) > POSE_TOLERANCE:
+                logger.info(f"Joints don't match pose {self.motion}: motion now unknown")
+                self.motion = None
+                return
+        elif (
+            previous is not None
+            and self._motion_since is not None
+            and previous[0] > self._motion_since
+            and _joint_difference(previous[1], joints) <= STILL_TOLERANCE
+        ):
+            logger.info(f"Joints still while {self.motion} is believed active: motion now unknown")
+            self.motion = None
+            return
+        self.verified_at = now
+
+    def start(self, interval: float = RECONCILE_INTERVAL) -> None:
+        """Start reconciling in the background every `interval` seconds."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._reconcile_loop(interval))
+
+    def stop(self) -> None:
+        """Stop the background reconcile loop."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _reconcile_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.warning(f"Reconcile failed: {e}")
+
+    def describe(self) -> str:
+        """Multi-line status report built from the model."""
+        if self.motion is None:
+            motion = "unknown"
+        else:
+            motion = f"{_NAMES_BY_CODE.get(self.motion, self.motion)} ({self.motion})"
+            if not self.verified:
+                motion += ", unverified"
+        gyro = {True: "on", False: "off", None: "unknown"}[self.gyro]
+        lines = [
+            f"Motion: {motion}",
+            f"Paused: {'yes' if self.paused else 'no'}",
+            f"Gyro: {gyro}",
+        ]
+        if self.voltage is not None:
+            lines.append(f"Voltage: {self.voltage:.2f} V")
+        if self.imu:
+            lines.append(
+                "IMU: " + ", ".join(f"{k} {self.imu[k]:.1f}" for k in ("yaw", "pitch", "roll") if k in self.imu)
+            )
+        if self.joints is not None:
+            lines.append("Joints: " + ", ".join(f"{a:g}" for a in self.joints))
+        if self.last_command is not None:
+            lines.append(f"Last command: {self.last_command} ({_age(self.commanded_at)})")
+        lines.append(f"Telemetry: {_age(self.telemetry_at)}, reconciled: {_age(self.reconciled_at)}")
+        return "\n".join(lines)
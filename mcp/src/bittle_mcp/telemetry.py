@@ -0,0 +1,111 @@
+"""
+Parsing of Bittle's serial replies into telemetry events.
+
+The BiBoard answers over the same UART it reads commands from. BLE delivers
+that stream in MTU-sized notifications, so a single line can be split across
+several notifications or several lines can arrive in one. TelemetryParser
+buffers the raw bytes and turns each complete line into a TelemetryEvent.
+
+Recognised lines (OpenCat firmware):
+- "Voltage: 7.45 V"            reply to T_POWER 'P'          -> kind "voltage"
+- "12.3\\t-4.5\\t0.8[\\t...]"      reply to T_PRINT_GYRO 'v'/'V' -> kind "gyro"
+- "=" then index row then angle row   reply to T_JOINTS 'j'  -> kind "joints"
+- a single token character, e.g. "k"  completion echo        -> kind "ack"
+- anything else                                              -> kind "text"
+"""
+
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Field names for the tab-separated gyro line printed by print6Axis()
+GYRO_FIELDS = ("yaw", "pitch", "roll", "acc_x", "acc_y", "acc_z", "acc_world_z")
+
+_VOLTAGE_RE = re.compile(r"^Voltage:\s*(-?\d+(?:\.\d+)?)\s*V?$")
+_NUMBER_RE = re.compile(r"^-?\d+(?:\.\d+)?$")
+
+
+@dataclass
+class TelemetryEvent:
+    """A parsed line received from Bittle."""
+
+    kind: str
+    raw: str
+    values: dict[str, float] = field(default_factory=dict)
+    token: Optional[str] = None
+    timestamp: float = field(default_factory=time.monotonic)
+
+
+def _split_numbers(line: str) -> Optional[list[float]]:
+    """Split a tab/comma separated line of numbers, or None if any part isn't numeric."""
+    parts = [p for p in re.split(r"[,\s]+", line) if p]
+    if not parts or not all(_NUMBER_RE.match(p) for p in parts):
+        return None
+    return [float(p) for p in parts]
+
+
+class TelemetryParser:
+    """Incremental parser for Bittle's reply stream."""
+
+    def __init__(self):
+        self._buffer = ""
+        self._joints_state = 0  # 0: idle, 1: saw "=", 2: saw index row
+
+    def feed(self, chunk: str) -> list[TelemetryEvent]:
+        """Add received text and return the events for every completed line.
+
+        Args:
+            chunk: Decoded notification payload
+
+        Returns:
+            Events for all complete lines, in arrival order
+        """
+        self._buffer += chunk.replace("\r", "")
+        *lines, self._buffer = self._buffer.split("\n")
+        events = []
+        for line in lines:
+            event = self.parse_line(line.strip())
+            if event is not None:
+                events.append(event)
+        return events
+
+    def parse_line(self, line: str) -> Optional[TelemetryEvent]:
+        """Parse a single complete line.
+
+        Returns:
+            The event, or None for blank lines and the intermediate lines of a
+            multi-line joint reply
+        """
+        if not line:
+            return None
+
+        if line == "=":
+            self._joints_state = 1
+            return None
+
+        numbers = _split_numbers(line)
+
+        if self._joints_state and numbers is not None:
+            if self._joints_state == 1 and len(numbers) > 1:
+                # Index row printed by range2String(DOF)
+                self._joints_state = 2
+                return None
+            self._joints_state = 0
+            if len(numbers) == 1:
+                # "j <index>" prints a single angle
+                return TelemetryEvent("joints", line, {"angle": numbers[0]})
+            return TelemetryEvent("joints", line, {f"j{i}": v for i, v in enumerate(numbers)})
+        self._joints_state = 0
+
+        match = _VOLTAGE_RE.match(line)
+        if match:
+            return TelemetryEvent("voltage", line, {"voltage": float(match.group(1))})
+
+        if numbers is not None and len(numbers) >= 3 and "\t" in line:
+            return TelemetryEvent("gyro", line, dict(zip(GYRO_FIELDS, numbers)))
+
+        if len(line) == 1 and not line.isdigit():
+            return TelemetryEvent("ack", line, token=line)
+
+        return TelemetryEvent("text", line)
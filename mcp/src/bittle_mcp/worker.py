@@ -0,0 +1,181 @@
+"""
+Bluetooth I/O on a dedicated thread.
+
+By default BLE notifications, GATT writes, FastMCP's stdio JSON handling and
+the tools all share one asyncio loop, so a slow tool or a large payload
+delays the robot link. ThreadedBittleConnection moves a BittleConnection
+(`inner`) onto its own event loop in a worker thread:
+
+- Calls from the MCP loop (connect, send, ...) are handed to the worker loop
+  with run_coroutine_threadsafe and awaited as futures. The write gate and
+  the priority lane are the inner connection's, so they run on the worker.
+- The reaction path attaches to `inner` and runs on the worker loop too:
+  the rules engine and the heading controller (see __init__.app_lifespan).
+  An emergency stop or a rule's rest is queued, flushed and written there.
+- Telemetry parsed on the worker, and every command the inner connection
+  wrote, is appended to a bounded ring (a deque, whose append/popleft are
+  atomic, so neither side takes a lock) and the MCP loop is woken once per
+  batch to deliver it to its listeners (state model, IMU recorder).
+
+A slow tool or a large payload therefore delays only what the MCP loop
+does: tool calls, state bookkeeping and recording. Reactive writes keep
+their timing, as far as the GIL lets the worker thread run.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Coroutine, Optional, Union
+
+from .bluetooth import SENDING_TASK, BittleConnection, MotionJob
+from .telemetry import TelemetryEvent
+
+logger = logging.getLogger("bittle-mcp.worker")
+
+# Telemetry events buffered between the worker and the MCP loop
+DEFAULT_TELEMETRY_CAPACITY = 1024
+
+
+class ThreadedBittleConnection(BittleConnection):
+    """A BittleConnection whose Bluetooth I/O runs on its own thread and loop."""
+
+    def __init__(
+        self,
+        inner: Optional[BittleConnection] = None,
+        telemetry_capacity: int = DEFAULT_TELEMETRY_CAPACITY,
+    ):
+        self.inner = inner if inner is not None else BittleConnection()
+        super().__init__()
+        self.dropped_events = 0
+        # Telemetry events and sent commands (str), in the order they happened
+        self._ring: deque[Union[TelemetryEvent, str]] = deque(maxlen=telemetry_capacity)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._owner_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._drain_scheduled = False
+        self.inner.add_listener(self._publish)
+        self.inner.add_send_listener(self._publish)
+
+    @property
+    def is_connected(self) -> bool:
+        """Check if the worker's connection is up."""
+        return self.inner.is_connected
+
+    @property
+    def address(self) -> Optional[str]:
+        """Get connected device address."""
+        return self.inner.address
+
+    @property
+    def flushed_commands(self) -> int:
+        """Commands dropped by emergency stops (counted by the inner connection)."""
+        return self.inner.flushed_commands
+
+    @flushed_commands.setter
+    def flushed_commands(self, value: int) -> None:
+        self.inner.flushed_commands = value
+
+    @property
+    def stop_latencies(self) -> deque[float]:
+        """Stop-to-wire latencies (measured by the inner connection)."""
+        return self.inner.stop_latencies
+
+    @stop_latencies.setter
+    def stop_latencies(self, value: deque[float]) -> None:
+        self.inner.stop_latencies = value
+
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        """The worker's event loop, while it runs."""
+        return self._loop
+
+    @property
+    def running(self) -> bool:
+        """Whether the worker thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the worker thread and its event loop (idempotent)."""
+        if self.running:
+            return
+        try:
+            self._owner_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="bittle-ble-io", daemon=True
+        )
+        self._thread.start()
+        logger.info("BLE I/O thread started")
+
+    def close(self) -> None:
+        """Stop the worker loop and join its thread."""
+        if not self.running:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5.0)
+        self._loop.close()
+        self._thread = None
+        self._loop = None
+        logger.info("BLE I/O thread stopped")
+
+    async def _call(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        """Run a coroutine on the worker loop and await its result here."""
+        self._owner_loop = asyncio.get_running_loop()
+        if not self.running:
+            self.start()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    async def scan(self, timeout: float = 10.0) -> list[dict]:
+        return await self._call(self.inner.scan(timeout=timeout))
+
+    async def connect(self, address: str) -> bool:
+        return await self._call(self.inner.connect(address))
+
+    async def disconnect(self) -> None:
+        await self._call(self.inner.disconnect())
+
+    def track_motion(self, task: MotionJob) -> None:
+        # Priority sends run on the worker, so the inner connection cancels the jobs
+        self.inner.track_motion(task)
+
+    async def send(self, command: str, priority: Optional[bool] = None) -> None:
+        """Send a command through the inner connection on the worker loop.
+
+        Send listeners are notified through the ring, like telemetry, before
+        this returns.
+        """
+        await self._call(self._send_for(asyncio.current_task(), command, priority))
+
+    async def _send_for(self, caller: Optional[asyncio.Task], command: str, priority: Optional[bool]) -> None:
+        # Runs in a task of its own on the worker: the caller is the motion job, if any
+        SENDING_TASK.set(caller)
+        await self.inner.send(command, priority)
+
+    def _publish(self, event: Union[TelemetryEvent, str]) -> None:
+        """Inner listener (worker thread): buffer an event or sent command and wake the MCP loop."""
+        if len(self._ring) == self._ring.maxlen:
+            self.dropped_events += 1
+        self._ring.append(event)
+
+        owner = self._owner_loop
+        if owner is None or owner.is_closed() or self._drain_scheduled:
+            return
+        self._drain_scheduled = True
+        try:
+            owner.call_soon_threadsafe(self._drain)
+        except RuntimeError:
+            self._drain_scheduled = False
+
+    def _drain(self) -> None:
+        """Deliver buffered telemetry and sent commands to listeners (MCP loop)."""
+        # Clear the flag first so events appended while draining schedule another pass
+        self._drain_scheduled = False
+        while self._ring:
+            item = self._ring.popleft()
+            if isinstance(item, str):
+                self._notify_sent(item)
+            else:
+                self._dispatch(item)
@@ -0,0 +1,84 @@
+"""Tests for IMU recording and gait analytics."""
+
+import math
+import time
+
+import pytest
+
+from bittle_mcp.bluetooth import MockBittleConnection
+from bittle_mcp.recording import SAMPLE_FIELDS, ImuRecorder
+
+np = pytest.importorskip("numpy")
+analytics = pytest.importorskip("bittle_mcp.analytics")
+
+
+def synthetic_session(freq: float, sway: float, seconds: float, rate: float = 50.0, seed: int = 0):
+    """Rows in SAMPLE_FIELDS order for a gait oscillating at `freq` Hz."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(0, seconds, 1 / rate) + rng.normal(0, 0.001, int(seconds * rate))
+    t.sort()
+    rows = np.zeros((t.size, len(SAMPLE_FIELDS)))
+    rows[:, 0] = t
+    rows[:, SAMPLE_FIELDS.index("pitch")] = sway * np.sin(2 * np.pi * freq * t)
+    rows[:, SAMPLE_FIELDS.index("roll")] = sway / 2 * np.cos(2 * np.pi * freq * t)
+    rows[:, SAMPLE_FIELDS.index("acc_world_z")] = 200 * np.sin(2 * np.pi * freq * t)
+    return rows
+
+
+def test_step_frequency_and_sway():
+    (summary,) = analytics.analyze({"walk": synthetic_session(1.5, 4.0, 61)})
+    assert summary.windows == 12
+    assert summary.step_frequency == pytest.approx(1.5, abs=0.05)
+    assert summary.pitch_rms == pytest.approx(4.0 / math.sqrt(2), rel=0.05)
+    assert summary.regularity > 0.9
+
+
+def test_steadier_gait_scores_higher():
+    calm, wobbly = analytics.analyze({
+        "calm": synthetic_session(1.5, 1.0, 30),
+        "wobbly": synthetic_session(2.5, 10.0, 30, seed=1),
+    })
+    assert calm.stability > wobbly.stability
+    assert wobbly.step_frequency == pytest.approx(2.5, abs=0.05)
+
+
+def test_falls_back_to_pitch_without_acceleration():
+    rows = synthetic_session(2.0, 5.0, 30)
+    rows[:, SAMPLE_FIELDS.index("acc_world_z")] = np.nan
+    (summary,) = analytics.analyze({"no_accel": rows})
+    assert summary.step_frequency == pytest.approx(2.0, abs=0.05)
+
+
+def test_short_session_is_reported_not_analysed():
+    long, short = analytics.analyze({
+        "long": synthetic_session(1.5, 2.0, 21),
+        "short": synthetic_session(1.5, 2.0, 1),
+    })
+    assert long.windows == 4
+    assert short.windows == 0
+    assert "too short" in short.describe()
+
+
+def test_hour_of_data_under_a_second():
+    sessions = {f"s{i}": synthetic_session(1.5 + i * 0.1, 3.0, 900, seed=i) for i in range(4)}
+    start = time.perf_counter()
+    summaries = analytics.analyze(sessions)
+    assert time.perf_counter() - start < 1.0
+    assert len(summaries) == 4
+
+
+async def test_recorder_collects_gyro_events():
+    conn = MockBittleConnection()
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+    recorder = ImuRecorder()
+    recorder.attach(conn)
+
+    conn.receive("1.0\t2.0\t3.0\n")  # not recording yet
+    recorder.start("walk")
+    conn.receive("1.0\t2.0\t3.0\nVoltage: 7.0 V\n4.0\t5.0\t6.0\t0\t0\t0\t9\n")
+    assert recorder.stop() == 2
+
+    first, second = recorder.sessions["walk"]
+    assert first[1:4] == (1.0, 2.0, 3.0)
+    assert math.isnan(first[-1])
+    assert second[-1] == 9.0
@@ -1,8 +1,13 @@
 """Tests for MockBittleConnection behavior."""
 
+import asyncio
+import subprocess
+import sys
+
 import pytest
 
-from bittle_mcp.bluetooth import MockBittleConnection
+from bittle_mcp.bluetooth import CommandFlushed, MockBittleConnection
+from bittle_mcp.simulator import SimulatedBittleConnection
 
 
 @pytest.fixture
@@ -39,3 +44,66 @@ async def test_address_property(conn):
     assert conn.address is None
     await conn.connect("AA:BB:CC:DD:EE:FF")
     assert conn.address == "AA:BB:CC:DD:EE:FF"
+
+
+async def test_priority_send_flushes_queued_commands():
+    sim = SimulatedBittleConnection(latency=0.05)
+    await sim.connect("AA:BB:CC:DD:EE:FF")
+    queued = [asyncio.create_task(sim.send(cmd)) for cmd in ("kwkF", "kwkL", "kwkR")]
+    await asyncio.sleep(0.01)  # kwkF is on the wire, the turns are queued
+
+    await sim.send("d")
+    results = await asyncio.gather(*queued, return_exceptions=True)
+    assert results[0] is None
+    assert all(isinstance(r, CommandFlushed) for r in results[1:])
+    assert [cmd for cmd, _ in sim.arrivals] == ["kwkF", "d"]
+    assert sim.flushed_commands == 2
+    # Waited out the in-flight write, then its own: well under the queue's 4 writes
+    assert sim.stop_latencies[-1] < 0.15
+    await sim.disconnect()
+
+
+async def test_priority_send_abandons_stalled_write(conn):
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+    mock_write = conn._write
+
+    async def stalling_write(command):
+        if command == "kwkF":
+            await asyncio.sleep(3600)  # the link hangs on this write
+        await mock_write(command)
+
+    conn._write = stalling_write
+    stalled = asyncio.create_task(conn.send("kwkF"))
+    await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(conn.send("d"), timeout=1.0)
+    assert conn.sent == ["d"]
+    assert conn.stop_latencies[-1] < 0.2
+    with pytest.raises(CommandFlushed):
+        await stalled
+
+    await conn.send("ksit")  # the slot is free again
+    assert conn.sent == ["d", "ksit"]
+
+
+async def test_priority_send_cancels_motion_jobs(conn):
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+    job = asyncio.create_task(asyncio.sleep(10))
+    conn.track_motion(job)
+    await conn.send("d")
+    await asyncio.sleep(0)
+    assert job.cancelled()
+
+
+async def test_normal_sends_keep_order(conn):
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+    await asyncio.gather(*(conn.send(cmd) for cmd in ("ksit", "kbalance", "khi")))
+    assert conn.sent == ["ksit", "kbalance", "khi"]
+    assert not conn.stop_latencies
+
+
+def test_import_does_not_load_heavy_dependencies():
+    # bleak and numpy are deferred to first use to keep server startup fast
+    code = "import sys, bittle_mcp; print('bleak' in sys.modules, 'numpy' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False False"
@@ -0,0 +1,98 @@
+"""Tests for synchronized multi-robot choreography."""
+
+import asyncio
+import time
+
+import pytest
+
+from bittle_mcp.bluetooth import MockBittleConnection
+from bittle_mcp.choreography import Choreography, SyncReport, probe
+from bittle_mcp.optimizer import Step
+from bittle_mcp.simulator import SimulatedBittleConnection
+
+STEPS = [Step("walk_forward", "kwkF", 0.2), Step("sit", "ksit", 0.2), Step("hello", "khi", 0.0)]
+
+
+@pytest.fixture
+async def robots():
+    robots = {
+        "near": SimulatedBittleConnection(latency=0.01, jitter=0.004, seed=1),
+        "far": SimulatedBittleConnection(latency=0.08, jitter=0.004, seed=2),
+    }
+    for robot in robots.values():
+        await robot.connect("AA:BB:CC:DD:EE:FF")
+    yield robots
+    for robot in robots.values():
+        await robot.disconnect()
+
+
+def _spread(robots, since):
+    """True per-step arrival spread from the simulators' own records."""
+    arrivals = [[t for cmd, t in r.arrivals if t >= since and cmd != "?"] for r in robots.values()]
+    return [max(times) - min(times) for times in zip(*arrivals)]
+
+
+async def test_probe_estimates_one_way_latency(robots):
+    link = await probe(robots["far"], count=5)
+    assert link.samples == 5
+    assert 0.075 < link.latency < 0.09
+    assert link.jitter < 0.01
+
+
+async def test_probe_without_replies_raises():
+    conn = MockBittleConnection()
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+    conn.receive = lambda message: None  # the robot never answers
+    with pytest.raises(RuntimeError):
+        await probe(conn, count=2, timeout=0.01)
+
+
+async def test_compensated_run_arrives_in_sync(robots):
+    show = Choreography(robots)
+    await show.calibrate(probes=5)
+    since = time.monotonic()
+    report = await show.run(STEPS)
+
+    assert max(_spread(robots, since)) < 0.02
+    errors = report.errors()
+    assert all(e is not None and e < 0.02 for e in errors)
+    assert not report.failed
+    assert "Sync error" in report.describe()
+
+
+async def test_uncompensated_run_drifts(robots):
+    show = Choreography(robots)  # not calibrated: every link counted as zero-latency
+    since = time.monotonic()
+    await show.run(STEPS)
+    assert min(_spread(robots, since)) > 0.05
+
+
+async def test_emergency_stop_interrupts_run(robots):
+    show = Choreography(robots)
+    running = asyncio.create_task(show.run([Step("walk_forward", "kwkF", 0.5), Step("sit", "ksit", 0.0)]))
+    await asyncio.sleep(0.3)
+    await robots["near"].send("d")
+    report = await running
+    assert report.failed == {"near": "interrupted by emergency stop"}
+
+
+def test_report_without_acks():
+    report = SyncReport(["sit"], {}, arrivals={"a": [None], "b": [0.01]})
+    assert report.errors() == [None]
+    assert "not measured" in report.describe()
+
+
+async def test_probe_ignores_late_echo_of_lost_probe():
+    conn = MockBittleConnection()
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+    delays = iter([0.08] + [0.03] * 10)  # the first echo misses its 0.05 s timeout
+
+    def deliver(reply):
+        asyncio.get_running_loop().call_later(next(delays), conn.receive, reply)
+
+    conn._deliver = deliver
+    link = await probe(conn, count=3, timeout=0.05)
+    assert link.lost == 1
+    assert link.samples == 2
+    # Each round trip is ~0.03 s; a late echo paired with the next probe would give ~0.01 s
+    assert link.latency > 0.012
@@ -0,0 +1,98 @@
+"""End-to-end tests for the heading controller against a simulated Bittle."""
+
+import asyncio
+import time
+
+import pytest
+
+from bittle_mcp.commands import COMMANDS
+from bittle_mcp.controller import Gains, HeadingController, wrap_angle
+from bittle_mcp.simulator import SimulatedBittleConnection
+
+
+@pytest.fixture
+async def sim():
+    sim = SimulatedBittleConnection(telemetry_rate=100.0, turn_rate=60.0, drift=20.0)
+    await sim.connect("AA:BB:CC:DD:EE:FF")
+    yield sim
+    await sim.disconnect()
+
+
+@pytest.fixture
+def controller(sim):
+    controller = HeadingController(rate=20.0, gains=Gains(kp=1.0, deadband=2.0))
+    controller.attach(sim)
+    yield controller
+    controller.detach()
+
+
+def test_wrap_angle():
+    assert wrap_angle(190) == -170
+    assert wrap_angle(-190) == 170
+    assert wrap_angle(0) == 0
+
+
+async def test_start_requires_yaw_reading():
+    controller = HeadingController()
+    with pytest.raises(ValueError):
+        controller.start()
+
+
+async def test_holds_heading_against_drift(sim, controller):
+    await asyncio.sleep(0.05)  # first telemetry
+    controller.start(target=0.0)
+    await asyncio.sleep(1.0)
+
+    # Without control, 20 deg/s of drift would be 20 deg off by now
+    assert abs(sim.yaw) < 8
+    assert {"kwkF", "kwkR"} & {command for command, _ in sim.arrivals}
+    stats = controller.stats()
+    assert stats["ticks"] >= 15
+    assert "jitter_p99_ms" in stats
+
+
+async def test_gait_without_combos_sends_gait_then_direction(sim, controller):
+    await asyncio.sleep(0.05)
+    controller.start(target=30.0, gait="run")
+    await asyncio.sleep(1.0)
+
+    sent = [command for command, _ in sim.arrivals]
+    assert sent[:2] == ["krn", "L"]
+    assert set(sent) <= set(COMMANDS.values())
+    assert abs(sim.yaw - 30.0) < 8
+
+
+async def test_turns_to_new_target(sim, controller):
+    await asyncio.sleep(0.05)
+    controller.start(target=30.0)
+    await asyncio.sleep(1.0)
+    assert abs(sim.yaw - 30.0) < 8
+
+
+async def test_pitch_limit_switches_to_balance(sim, controller):
+    await asyncio.sleep(0.05)
+    sim.pitch = 60.0
+    controller.start(target=0.0)
+    await asyncio.sleep(0.2)
+    assert controller.last_command == "kbalance"
+
+
+async def test_blocked_loop_counts_overruns(sim, controller):
+    await asyncio.sleep(0.05)
+    controller.start(target=0.0)
+    await asyncio.sleep(0.1)
+    time.sleep(0.2)  # block the event loop for several periods
+    await asyncio.sleep(0.1)
+    assert controller.overruns >= 1
+    assert controller.stats()["jitter_max_ms"] > 100
+
+
+async def test_stop_halts_loop(sim, controller):
+    await asyncio.sleep(0.05)
+    controller.start()
+    await asyncio.sleep(0.1)
+    controller.stop()
+    ticks = controller.ticks
+    await asyncio.sleep(0.15)
+    assert not controller.running
+    assert controller.ticks == ticks
@@ -0,0 +1,82 @@
+"""Tests for the command-stream optimizer."""
+
+from bittle_mcp.optimizer import Step, optimize
+
+
+def codes(plan):
+    return [step.code for step in plan.steps]
+
+
+def test_gait_and_direction_merge_into_combo():
+    plan = optimize([Step("walk", "kwk"), Step("forward", "F", 2.0)])
+    assert codes(plan) == ["kwkF"]
+    assert plan.steps[0].delay == 2.0
+    assert plan.writes_saved == 1
+
+
+def test_no_merge_without_combo():
+    plan = optimize([Step("crawl", "kcr"), Step("left", "L")])
+    assert codes(plan) == ["kcr", "L"]
+    assert plan.writes_saved == 0
+
+
+def test_no_merge_across_delay():
+    plan = optimize([Step("walk", "kwk", 1.0), Step("forward", "F")])
+    assert codes(plan) == ["kwk", "F"]
+
+
+def test_redundant_gait_dropped_and_delay_kept():
+    plan = optimize([
+        Step("walk_forward", "kwkF", 2.0),
+        Step("bark", "b14,4", 0.5),
+        Step("walk", "kwk", 1.0),
+        Step("left", "L"),
+    ])
+    assert codes(plan) == ["kwkF", "b14,4", "L"]
+    assert plan.steps[1].delay == 1.5
+
+
+def test_repeated_pose_dropped():
+    plan = optimize([Step("sit", "ksit", 1.0), Step("sit", "ksit", 1.0), Step("rest", "d")])
+    assert codes(plan) == ["ksit", "d"]
+    assert plan.steps[0].delay == 2.0
+
+
+def test_repeated_rest_kept():
+    plan = optimize([Step("rest", "d", 1.0), Step("rest", "d")], active="d")
+    assert codes(plan) == ["d", "d"]
+    assert plan.writes_saved == 0
+
+
+def test_repeated_trick_kept():
+    plan = optimize([Step("hello", "khi"), Step("hello", "khi")])
+    assert codes(plan) == ["khi", "khi"]
+
+
+def test_known_initial_state():
+    plan = optimize([Step("sit", "ksit", 1.0), Step("hello", "khi")], active="ksit")
+    assert codes(plan) == ["", "khi"]
+    assert plan.steps[0].delay == 1.0
+    assert plan.writes == 1
+
+
+def test_pause_pair_cancels():
+    plan = optimize([Step("walk_forward", "kwkF"), Step("pause", "p", 0), Step("pause", "p", 1.0), Step("sit", "ksit")])
+    assert codes(plan) == ["kwkF", "ksit"]
+    assert plan.steps[0].delay == 1.0
+
+
+def test_single_pause_kept():
+    plan = optimize([Step("walk_forward", "kwkF", 2.0), Step("pause", "p")])
+    assert codes(plan) == ["kwkF", "p"]
+
+
+def test_adjacent_sounds_coalesce():
+    plan = optimize([Step("a", "b14,4", 0), Step("b", "b17,2", 0.5)])
+    assert codes(plan) == ["b14,4,17,2"]
+    assert plan.steps[0].delay == 0.5
+
+
+def test_summary_reports_saved_writes():
+    plan = optimize([Step("walk", "kwk"), Step("forward", "F")])
+    assert plan.summary() == "Optimized: 2 -> 1 writes (1 saved)"
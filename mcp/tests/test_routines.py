@@ -0,0 +1,169 @@
+"""Tests for routine files and the compiled-plan cache."""
+
+import json
+import os
+import sys
+
+import pytest
+
+from bittle_mcp.routines import CACHE_DIR, MAX_STEPS, RoutineError, RoutineLibrary, library_dir
+
+
+def write(directory, name, doc):
+    path = directory / f"{name}.json"
+    path.write_text(json.dumps(doc))
+    return path
+
+
+def touch_later(path):
+    """Bump mtime so a same-size rewrite within the timer resolution is still seen."""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def library(tmp_path):
+    write(tmp_path, "spin", {
+        "params": {"turns": 1},
+        "steps": [{"repeat": "$turns", "steps": [{"command": "walk_left", "delay": 0.5}]}],
+    })
+    write(tmp_path, "patrol", {
+        "params": {"laps": 2, "gait": "walk_forward"},
+        "steps": [
+            {"command": "stand", "delay": 0.5},
+            {"repeat": "$laps", "steps": [
+                {"command": "$gait", "delay": 2.0},
+                {"include": "spin", "with": {"turns": 2}},
+            ]},
+            {"command": "sit"},
+        ],
+    })
+    return RoutineLibrary(tmp_path)
+
+
+def codes(routine):
+    return [step.code for step in routine.plan.steps]
+
+
+def test_compiles_loops_params_and_includes(library):
+    routine = library.load("patrol")
+    # Back-to-back walk_left steps are dropped as redundant, their delay kept
+    assert codes(routine) == ["kup", "kwkF", "kwkL", "kwkF", "kwkL", "ksit"]
+    assert routine.plan.original_writes == 8
+    assert routine.duration == pytest.approx(0.5 + 2 * (2.0 + 2 * 0.5))
+    assert routine.plan.steps[-1].delay == 0.0
+    assert set(routine.sources) == {"patrol", "spin"}
+
+
+def test_parameter_overrides(library):
+    routine = library.load("patrol", {"laps": 1, "gait": "trot_forward"})
+    assert codes(routine) == ["kup", "ktrF", "kwkL", "ksit"]
+
+
+def test_repeated_rest_is_kept(tmp_path):
+    write(tmp_path, "settle", {"steps": [{"repeat": 2, "steps": [{"command": "rest", "delay": 0.5}]}]})
+    assert codes(RoutineLibrary(tmp_path).load("settle")) == ["d", "d"]
+
+
+def test_memory_cache_hit(library):
+    first = library.load("patrol")
+    assert library.load("patrol") is first
+    assert (library.compiles, library.memory_hits) == (1, 1)
+
+
+def test_disk_cache_survives_restart(library, tmp_path):
+    library.load("patrol")
+    assert list((tmp_path / CACHE_DIR).glob("patrol.*.json"))
+
+    fresh = RoutineLibrary(tmp_path)
+    routine = fresh.load("patrol")
+    assert (fresh.compiles, fresh.disk_hits) == (0, 1)
+    assert codes(routine) == codes(library.load("patrol"))
+
+
+def test_tampered_cache_is_recompiled(library, tmp_path):
+    library.load("patrol")
+    (cached,) = (tmp_path / CACHE_DIR).glob("patrol.*.json")
+    data = json.loads(cached.read_text())
+    data["steps"][0][1] = "kANYTHING_RAW"
+    cached.write_text(json.dumps(data))
+
+    fresh = RoutineLibrary(tmp_path)
+    assert "kANYTHING_RAW" not in codes(fresh.load("patrol"))
+    assert (fresh.compiles, fresh.disk_hits) == (1, 0)
+
+
+def test_cached_coalesced_melody_is_accepted(tmp_path):
+    write(tmp_path, "song", {"steps": [{"command": "bark", "delay": 0}, {"command": "bark"}]})
+    RoutineLibrary(tmp_path).load("song")
+    fresh = RoutineLibrary(tmp_path)
+    assert codes(fresh.load("song"))[0].count("14,2") == 2
+    assert fresh.disk_hits == 1
+
+
+def test_command_table_change_invalidates_disk_cache(library, tmp_path, monkeypatch):
+    library.load("patrol")
+    # The package attribute bittle_mcp.routines is the server's library global, not this module
+    monkeypatch.setattr(sys.modules["bittle_mcp.routines"], "PLAN_STAMP", "changed")
+    fresh = RoutineLibrary(tmp_path)
+    fresh.load("patrol")
+    assert (fresh.compiles, fresh.disk_hits) == (1, 0)
+
+
+def test_editing_an_include_invalidates(library, tmp_path):
+    library.load("patrol")
+    spin = write(tmp_path, "spin", {
+        "params": {"turns": 1},
+        "steps": [{"repeat": "$turns", "steps": [{"command": "walk_right", "delay": 0.5}]}],
+    })
+    touch_later(spin)
+    assert "kwkR" in codes(library.load("patrol"))
+    assert library.compiles == 2
+
+    # The edited include also misses the disk cache of a fresh library
+    fresh = RoutineLibrary(tmp_path)
+    assert "kwkR" in codes(fresh.load("patrol"))
+
+
+def test_editing_the_routine_prunes_stale_plans(library, tmp_path):
+    library.load("patrol")
+    patrol = write(tmp_path, "patrol", {"steps": [{"command": "sit"}]})
+    touch_later(patrol)
+    assert codes(library.load("patrol")) == ["ksit"]
+    assert len(list((tmp_path / CACHE_DIR).glob("patrol.*.json"))) == 1
+
+
+@pytest.mark.parametrize("doc, message", [
+    ({"steps": [{"command": "fly"}]}, "Unknown command 'fly'"),
+    ({"steps": [{"command": "sit", "delay": -1}]}, "delay must be"),
+    ({"steps": [{"command": "$speed"}]}, "unknown parameter $speed"),
+    ({"steps": [{"repeat": 1.5, "steps": []}]}, "repeat must be"),
+    ({"steps": [{"command": "sit", "repeat": 2}]}, "exactly one of"),
+    ({"steps": [{"include": "missing"}]}, "Unknown routine: missing"),
+    ({"steps": [{"include": "broken"}]}, "Include cycle: broken -> broken"),
+    ({"steps": [{"repeat": MAX_STEPS + 1, "steps": [{"command": "sit"}]}]}, "more than"),
+    ({"steps": []}, "no steps"),
+])
+def test_invalid_routines(tmp_path, doc, message):
+    write(tmp_path, "broken", doc)
+    with pytest.raises(RoutineError, match=message.replace("$", r"\$")):
+        RoutineLibrary(tmp_path).load("broken")
+
+
+def test_unknown_override_and_name(library):
+    with pytest.raises(RoutineError, match="unknown parameter"):
+        library.load("patrol", {"speed": 2})
+    with pytest.raises(RoutineError, match="Invalid routine name"):
+        library.load("../patrol")
+    with pytest.raises(RoutineError, match="Unknown routine"):
+        library.load("dance")
+
+
+def test_names(library, tmp_path):
+    assert library.names() == ["patrol", "spin"]
+    assert RoutineLibrary(tmp_path / "missing").names() == []
+
+
+def test_library_dir_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("BITTLE_MCP_ROUTINES", str(tmp_path))
+    assert library_dir() == tmp_path
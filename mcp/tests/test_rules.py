@@ -0,0 +1,103 @@
+"""Tests for the telemetry-driven rules engine."""
+
+import pytest
+
+from bittle_mcp.bluetooth import MockBittleConnection
+from bittle_mcp.rules import Rule, RulesEngine
+from bittle_mcp.telemetry import TelemetryEvent
+
+
+@pytest.fixture
+async def conn():
+    conn = MockBittleConnection()
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+    return conn
+
+
+@pytest.fixture
+def engine(conn):
+    engine = RulesEngine()
+    engine.attach(conn)
+    yield engine
+    engine.detach()
+
+
+def voltage(value: float, at: float) -> TelemetryEvent:
+    return TelemetryEvent("voltage", f"Voltage: {value} V", {"voltage": value}, timestamp=at)
+
+
+async def test_threshold_fires_command(conn, engine):
+    engine.install(Rule("low", "voltage", "voltage", "<", 6.8, "rest"))
+    conn.receive("Voltage: 6.50 V\n")
+    await engine.drain()
+    assert conn.sent == ["d"]
+    assert engine.rules[0].fire_count == 1
+    assert engine.rules[0].last_latency is not None
+
+
+async def test_threshold_not_met(conn, engine):
+    engine.install(Rule("low", "voltage", "voltage", "<", 6.8, "rest"))
+    conn.receive("Voltage: 7.40 V\n")
+    await engine.drain()
+    assert conn.sent == []
+
+
+async def test_edge_fires_once_per_crossing(conn, engine):
+    engine.install(Rule("low", "voltage", "voltage", "<", 6.8, "rest", cooldown=0))
+    for value in (6.5, 6.4, 7.2, 6.3):
+        engine.on_event(voltage(value, at=0))
+    await engine.drain()
+    assert conn.sent == ["d", "d"]
+
+
+async def test_level_respects_cooldown(conn, engine):
+    engine.install(Rule("low", "voltage", "voltage", "<", 6.8, "rest", edge=False, cooldown=1.0))
+    for t in (0.0, 0.5, 1.0, 1.2):
+        engine.on_event(voltage(6.5, at=t))
+    await engine.drain()
+    assert conn.sent == ["d", "d"]
+
+
+async def test_debounce_requires_sustained_condition(conn, engine):
+    engine.install(Rule("tilt", "gyro", "pitch", "abs>", 60, "rest", debounce=0.2))
+    tilt = lambda pitch, t: TelemetryEvent("gyro", "", {"pitch": pitch}, timestamp=t)
+    engine.on_event(tilt(-70, 0.0))
+    engine.on_event(tilt(-70, 0.1))
+    engine.on_event(tilt(10, 0.15))
+    engine.on_event(tilt(70, 0.2))
+    await engine.drain()
+    assert conn.sent == []
+    engine.on_event(tilt(75, 0.45))
+    await engine.drain()
+    assert conn.sent == ["d"]
+
+
+async def test_other_event_kinds_ignored(conn, engine):
+    engine.install(Rule("low", "voltage", "voltage", "<", 6.8, "rest"))
+    conn.receive("1.0\t2.0\t3.0\n")
+    await engine.drain()
+    assert conn.sent == []
+
+
+async def test_install_replaces_and_remove(engine):
+    engine.install(Rule("low", "voltage", "voltage", "<", 6.8, "rest"))
+    engine.install(Rule("low", "voltage", "voltage", "<", 6.5, "sit"))
+    assert len(engine.rules) == 1
+    assert engine.rules[0].command == "sit"
+    assert engine.remove("low")
+    assert not engine.remove("low")
+
+
+def test_invalid_rule_rejected():
+    with pytest.raises(ValueError):
+        Rule("bad", "voltage", "voltage", "=>", 6.8, "rest")
+    with pytest.raises(ValueError):
+        Rule("bad", "voltage", "voltage", "<", 6.8, "selfdestruct")
+    with pytest.raises(ValueError, match="Unknown event"):
+        Rule("bad", "volts", "voltage", "<", 6.8, "rest")
+    with pytest.raises(ValueError, match="Unknown event"):
+        Rule("bad", "ack", "voltage", "<", 6.8, "rest")
+    with pytest.raises(ValueError, match="Unknown field for voltage"):
+        Rule("bad", "voltage", "volts", "<", 6.8, "rest")
+    with pytest.raises(ValueError, match="Unknown field for joints"):
+        Rule("bad", "joints", "j16", ">", 45, "rest")
@@ -0,0 +1,43 @@
+"""Tests for the simulated Bittle."""
+
+import asyncio
+
+import pytest
+
+from bittle_mcp.simulator import SimulatedBittleConnection
+
+
+@pytest.fixture
+async def sim():
+    sim = SimulatedBittleConnection(telemetry_rate=100.0, turn_rate=90.0)
+    await sim.connect("AA:BB:CC:DD:EE:FF")
+    yield sim
+    await sim.disconnect()
+
+
+async def test_streams_gyro_telemetry(sim):
+    events = []
+    sim.add_listener(events.append)
+    await asyncio.sleep(0.1)
+    assert events and all(e.kind == "gyro" for e in events)
+
+
+async def test_turning_changes_yaw(sim):
+    await sim.send("kwkL")
+    await asyncio.sleep(0.2)
+    assert sim.yaw > 10
+    await sim.send("ksit")
+    yaw = sim.yaw
+    await asyncio.sleep(0.1)
+    assert abs(sim.yaw - yaw) < 1
+
+
+async def test_link_latency_delays_arrival():
+    sim = SimulatedBittleConnection(latency=0.05)
+    await sim.connect("AA:BB:CC:DD:EE:FF")
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await sim.send("ksit")
+    assert loop.time() - start >= 0.05
+    assert sim.arrivals[0][0] == "ksit"
+    await sim.disconnect()
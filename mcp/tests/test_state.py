@@ -0,0 +1,136 @@
+"""Tests for the local robot state model."""
+
+import time
+
+import pytest
+
+from bittle_mcp.bluetooth import MOCK_REPLIES, MockBittleConnection
+from bittle_mcp.state import UNVERIFIED_AFTER, RobotState
+
+
+def joints_reply(angles):
+    row = ",\t".join(str(a) for a in angles) + ",\t\n"
+    return "=\n" + ",\t".join(str(i) for i in range(16)) + ",\t\n" + row
+
+
+@pytest.fixture
+async def conn():
+    conn = MockBittleConnection()
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+    return conn
+
+
+@pytest.fixture
+def state(conn):
+    state = RobotState()
+    state.attach(conn)
+    yield state
+    state.detach()
+
+
+async def test_tracks_pose_and_gait(conn, state):
+    await conn.send("ksit")
+    assert state.motion == "ksit"
+    await conn.send("kwk")
+    await conn.send("F")
+    assert state.motion == "kwkF"
+
+
+async def test_redundant_pose(conn, state):
+    assert not state.is_redundant("ksit")
+    await conn.send("ksit")
+    assert state.is_redundant("ksit")
+    assert not state.is_redundant("khi")
+
+
+async def test_pause_toggles_and_disables_skipping(conn, state):
+    await conn.send("ksit")
+    await conn.send("p")
+    assert state.paused
+    assert not state.is_redundant("ksit")
+    await conn.send("p")
+    assert not state.paused
+    assert state.is_redundant("ksit")
+
+
+async def test_gyro_and_queries_keep_motion(conn, state):
+    await conn.send("kwkF")
+    await conn.send("G")
+    await conn.send("P")
+    assert state.gyro is False
+    assert state.motion == "kwkF"
+
+
+async def test_trick_makes_motion_unknown(conn, state):
+    await conn.send("ksit")
+    await conn.send("khi")
+    assert state.motion is None
+
+
+async def test_telemetry_updates_readings(conn, state):
+    conn.receive("Voltage: 7.10 V\n1.0\t2.0\t3.0\n")
+    assert state.voltage == 7.1
+    assert state.imu["pitch"] == 2.0
+
+
+async def test_fall_clears_motion(conn, state):
+    await conn.send("kwkF")
+    conn.receive("0.0\t85.0\t3.0\n")
+    assert state.motion is None
+
+
+async def test_reconcile_queries_joints_and_imu(conn, state):
+    assert await state.reconcile(timeout=0.5)
+    assert conn.sent == ["j", "v"]
+    assert state.joints == [0] * 16
+    assert state.reconciled_at is not None
+
+
+async def test_reconcile_contradicting_pose_clears_motion(conn, state, monkeypatch):
+    await conn.send("ksit")
+    assert await state.reconcile(timeout=0.5)  # learns the sit angles
+    assert state.is_redundant("ksit")
+
+    # The robot is no longer sitting (e.g. the firmware rested it)
+    monkeypatch.setitem(MOCK_REPLIES, "j", joints_reply([30] * 16))
+    assert await state.reconcile(timeout=0.5)
+    assert state.motion is None
+    assert not state.is_redundant("ksit")
+
+
+async def test_reconcile_matching_pose_keeps_motion(conn, state, monkeypatch):
+    await conn.send("ksit")
+    assert await state.reconcile(timeout=0.5)
+    monkeypatch.setitem(MOCK_REPLIES, "j", joints_reply([3] * 16))
+    assert await state.reconcile(timeout=0.5)
+    assert state.is_redundant("ksit")
+
+
+async def test_reconcile_still_joints_clear_gait(conn, state, monkeypatch):
+    await conn.send("kwkF")
+    assert await state.reconcile(timeout=0.5)
+    monkeypatch.setitem(MOCK_REPLIES, "j", joints_reply([20] * 16))
+    assert await state.reconcile(timeout=0.5)  # joints moved: still walking
+    assert state.is_redundant("kwkF")
+    assert await state.reconcile(timeout=0.5)  # same angles again: stopped
+    assert state.motion is None
+
+
+async def test_unverified_motion_not_trusted(conn, state):
+    await conn.send("ksit")
+    state.verified_at = time.monotonic() - UNVERIFIED_AFTER - 1
+    assert state.motion == "ksit"
+    assert not state.is_redundant("ksit")
+    assert "unverified" in state.describe()
+
+
+async def test_reconcile_when_disconnected(conn, state):
+    await conn.disconnect()
+    assert not await state.reconcile(timeout=0.1)
+
+
+async def test_describe(conn, state):
+    await conn.send("kwkF")
+    report = state.describe()
+    assert "Motion: walk_forward (kwkF)" in report
+    assert "Paused: no" in report
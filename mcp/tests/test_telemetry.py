@@ -0,0 +1,56 @@
+"""Tests for parsing Bittle replies into telemetry events."""
+
+import pytest
+
+from bittle_mcp.telemetry import TelemetryParser
+
+
+@pytest.fixture
+def parser():
+    return TelemetryParser()
+
+
+def test_voltage_line(parser):
+    (event,) = parser.feed("Voltage: 7.45 V\n")
+    assert event.kind == "voltage"
+    assert event.values == {"voltage": 7.45}
+
+
+def test_gyro_line(parser):
+    (event,) = parser.feed("12.30\t-4.50\t0.80\t1\t2\t3\t4\n")
+    assert event.kind == "gyro"
+    assert event.values["yaw"] == 12.3
+    assert event.values["pitch"] == -4.5
+    assert event.values["acc_world_z"] == 4
+
+
+def test_line_split_across_notifications(parser):
+    assert parser.feed("Volt") == []
+    assert parser.feed("age: 6.") == []
+    (event,) = parser.feed("90 V\r\n")
+    assert event.values == {"voltage": 6.9}
+
+
+def test_multiple_lines_in_one_chunk(parser):
+    events = parser.feed("k\nd\n")
+    assert [e.kind for e in events] == ["ack", "ack"]
+    assert [e.token for e in events] == ["k", "d"]
+
+
+def test_joint_table(parser):
+    events = parser.feed("=\n0,\t1,\t2,\t\n0,\t-45,\t30,\t\n")
+    (event,) = events
+    assert event.kind == "joints"
+    assert event.values == {"j0": 0, "j1": -45, "j2": 30}
+
+
+def test_single_joint(parser):
+    (event,) = parser.feed("=\n-45\n")
+    assert event.kind == "joints"
+    assert event.values == {"angle": -45}
+
+
+def test_unrecognised_line_is_text(parser):
+    (event,) = parser.feed("Undefined token!\n")
+    assert event.kind == "text"
+    assert event.raw == "Undefined token!"
@@ -1,18 +1,51 @@
 """Integration tests for MCP tool functions."""
 
+import asyncio
+import logging
+
 import pytest
 
 import bittle_mcp
-from bittle_mcp import scan, connect, disconnect, send, move, play_sound, status, list_commands
-from bittle_mcp.bluetooth import MockBittleConnection
+from bittle_mcp import scan, connect, disconnect, send, move, play_sound, sequence, status, list_commands
+from bittle_mcp import emergency_stop, add_robot, remove_robot, choreograph, run_routine, list_routines
+from bittle_mcp import install_rule, remove_rule, list_rules
+from bittle_mcp import start_recording, stop_recording, analyze_gait
+from bittle_mcp import hold_heading, tune_controller, stop_controller, controller_status
+from bittle_mcp.bluetooth import BittleConnection, MockBittleConnection
+from bittle_mcp.controller import HeadingController
+from bittle_mcp.recording import ImuRecorder
+from bittle_mcp.routines import RoutineLibrary
+from bittle_mcp.rules import RulesEngine
+from bittle_mcp.simulator import SimulatedBittleConnection
+from bittle_mcp.state import RobotState
+from bittle_mcp.worker import ThreadedBittleConnection
 
 
 @pytest.fixture(autouse=True)
-def setup_mock_connection():
+def setup_mock_connection(tmp_path):
     """Inject a MockBittleConnection for every test."""
     mock = MockBittleConnection()
     bittle_mcp.bittle = mock
+    bittle_mcp.rules = RulesEngine()
+    bittle_mcp.rules.attach(mock)
+    bittle_mcp.state = RobotState()
+    bittle_mcp.state.attach(mock)
+    bittle_mcp.recorder = ImuRecorder()
+    bittle_mcp.recorder.attach(mock)
+    bittle_mcp.controller = HeadingController()
+    bittle_mcp.controller.attach(mock)
+    bittle_mcp.routines = RoutineLibrary(tmp_path)
     yield mock
+    bittle_mcp.routines = None
+    bittle_mcp.fleet.clear()
+    bittle_mcp.controller.detach()
+    bittle_mcp.controller = None
+    bittle_mcp.recorder.detach()
+    bittle_mcp.recorder = None
+    bittle_mcp.state.detach()
+    bittle_mcp.state = None
+    bittle_mcp.rules.detach()
+    bittle_mcp.rules = None
     bittle_mcp.bittle = None
 
 
@@ -66,6 +99,22 @@ async def test_send_unknown_command(setup_mock_connection):
     assert "Valid commands" in result
 
 
+async def test_send_skips_redundant_pose(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    await send("sit")
+    result = await send("sit")
+    assert "Skipped" in result
+    assert setup_mock_connection.sent == ["ksit"]
+
+
+async def test_send_force_resends(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    await send("sit")
+    result = await send("sit", force=True)
+    assert "Sent" in result
+    assert setup_mock_connection.sent == ["ksit", "ksit"]
+
+
 async def test_send_while_disconnected():
     result = await send("sit")
     assert "Not connected" in result
@@ -91,6 +140,181 @@ async def test_move_invalid_gait(setup_mock_connection):
     assert "Unknown gait" in result
 
 
+async def test_move_uses_combo_token(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    result = await move("forward", "walk")
+    assert setup_mock_connection.sent == ["kwkF"]
+    assert "1 saved" in result
+
+
+async def test_move_skips_active_gait(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    await move("forward", "walk")
+    await move("left", "walk")
+    assert setup_mock_connection.sent == ["kwkF", "L"]
+
+
+async def test_move_force_resends_active_gait(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    await move("forward", "walk")
+    await move("forward", "walk")
+    await move("forward", "walk", force=True)
+    assert setup_mock_connection.sent == ["kwkF", "kwkF"]
+
+
+async def test_unverified_motion_is_not_skipped(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    await move("forward", "walk")
+    bittle_mcp.state.verified_at -= 1000
+    await move("forward", "walk")
+    bittle_mcp.state.verified_at -= 1000
+    await sequence([{"command": "walk_forward"}])
+    assert setup_mock_connection.sent == ["kwkF", "kwkF", "kwkF"]
+
+
+async def test_move_without_combo_sends_both(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    await move("left", "crawl")
+    assert setup_mock_connection.sent == ["kcr", "L"]
+
+
+# --- sequence ---
+
+async def test_sequence_optimizes_steps(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    result = await sequence([
+        {"command": "walk", "delay": 0},
+        {"command": "forward", "delay": 0},
+        {"command": "walk", "delay": 0},
+        {"command": "sit", "delay": 0},
+    ])
+    assert setup_mock_connection.sent == ["kwkF", "ksit"]
+    assert "Optimized: 4 -> 2 writes (2 saved)" in result
+
+
+async def test_sequence_never_drops_rest(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    await send("rest")
+    result = await sequence([{"command": "rest"}])
+    assert setup_mock_connection.sent == ["d", "d"]
+    assert "rest" in result
+
+
+async def test_sequence_without_optimization(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    await sequence([{"command": "walk", "delay": 0}, {"command": "forward"}], optimize_steps=False)
+    assert setup_mock_connection.sent == ["kwk", "F"]
+
+
+async def test_sequence_unknown_command_sends_nothing(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    result = await sequence([{"command": "sit", "delay": 0}, {"command": "fly"}])
+    assert "Unknown command 'fly'" in result
+    assert setup_mock_connection.sent == []
+
+
+# --- emergency_stop ---
+
+async def test_emergency_stop_interrupts_sequence(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    running = asyncio.create_task(sequence([
+        {"command": "walk_forward", "delay": 10.0},
+        {"command": "sit"},
+    ]))
+    await asyncio.sleep(0.01)
+
+    result = await emergency_stop()
+    assert result.startswith("Stopped: rest sent in")
+    report = await running
+    assert "Interrupted by emergency stop" in report
+    assert setup_mock_connection.sent == ["kwkF", "d"]
+
+
+async def test_emergency_stop_stops_controller(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    setup_mock_connection.receive("0.0\t0.0\t0.0\n")
+    await hold_heading()
+    await emergency_stop()
+    assert not bittle_mcp.controller.running
+
+
+async def test_send_rest_is_never_skipped(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    await send("rest")
+    result = await send("rest")
+    assert result == "Sent: rest (d)"
+
+
+async def test_emergency_stop_while_disconnected():
+    result = await emergency_stop()
+    assert "Not connected" in result
+
+
+# --- routines ---
+
+async def test_run_routine(setup_mock_connection, tmp_path):
+    await connect("AA:BB:CC:DD:EE:FF")
+    (tmp_path / "greet.json").write_text(
+        '{"params": {"times": 2}, "steps": ['
+        '{"repeat": "$times", "steps": [{"command": "hello", "delay": 0}]}, {"command": "sit"}]}'
+    )
+    result = await run_routine("greet", {"times": 3})
+    assert result.startswith("Routine greet complete")
+    assert setup_mock_connection.sent == ["khi", "khi", "khi", "ksit"]
+    assert "  greet" in await list_routines()
+
+
+async def test_run_routine_invalid(setup_mock_connection, tmp_path):
+    await connect("AA:BB:CC:DD:EE:FF")
+    (tmp_path / "bad.json").write_text('{"steps": [{"command": "fly"}]}')
+    assert "Unknown command 'fly'" in await run_routine("bad")
+    assert "Unknown routine" in await run_routine("missing")
+    assert setup_mock_connection.sent == []
+
+
+async def test_list_routines_empty():
+    assert (await list_routines()).startswith("No routines")
+
+
+# --- choreography ---
+
+async def test_add_and_remove_robot(monkeypatch):
+    monkeypatch.setenv("BITTLE_MCP_MOCK", "1")
+    result = await add_robot("second", "11:22:33:44:55:66")
+    assert "Added second" in result
+    assert "already in use" in await add_robot("second", "11:22:33:44:55:66")
+    assert "already in use" in await add_robot("main", "11:22:33:44:55:66")
+    assert await remove_robot("second") == "Removed second"
+    assert "Unknown robot" in await remove_robot("second")
+
+
+async def test_add_robot_invalid_address():
+    result = await add_robot("second", "nope")
+    assert "Invalid address" in result
+
+
+async def test_choreograph_sends_to_every_robot(setup_mock_connection, monkeypatch):
+    monkeypatch.setenv("BITTLE_MCP_MOCK", "1")
+    await connect("AA:BB:CC:DD:EE:FF")
+    await add_robot("second", "11:22:33:44:55:66")
+    result = await choreograph([{"command": "sit", "delay": 0}, {"command": "bark"}], probes=2)
+    assert result.startswith("Choreography complete: 2 steps on 2 robots")
+    assert "main: latency" in result and "second: latency" in result
+    for robot in (setup_mock_connection, bittle_mcp.fleet["second"]):
+        assert [cmd for cmd in robot.sent if cmd != "?"] == ["ksit", "b14,4,17,4,14,4,17,4,14,2"]
+
+
+async def test_choreograph_requires_connection(setup_mock_connection):
+    result = await choreograph([{"command": "sit"}])
+    assert "Not connected: main" in result
+
+
+async def test_choreograph_unknown_command(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    result = await choreograph([{"command": "fly"}])
+    assert "Unknown command 'fly'" in result
+
+
 # --- play_sound ---
 
 async def test_play_sound_bark(setup_mock_connection):
@@ -118,6 +342,22 @@ async def test_status_connected(setup_mock_connection):
     assert "AA:BB:CC:DD:EE:FF" in result
 
 
+async def test_status_reports_state_without_sending(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    await send("sit")
+    result = await status()
+    assert "Motion: sit (ksit)" in result
+    assert setup_mock_connection.sent == ["ksit"]
+
+
+async def test_status_refresh_queries_robot(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    result = await status(refresh=True)
+    assert setup_mock_connection.sent == ["j", "v"]
+    assert "Joints:" in result
+    assert "timed out" not in result
+
+
 # --- disconnect ---
 
 async def test_disconnect_when_not_connected():
@@ -132,3 +372,153 @@ async def test_list_commands_returns_content():
     assert len(result) > 0
     assert "sit" in result
     assert "walk" in result
+
+
+# --- rules ---
+
+async def test_install_rule_reacts_to_telemetry(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    result = await install_rule("low_battery", "voltage", "voltage", "<", 6.8, "rest")
+    assert "Installed rule" in result
+
+    setup_mock_connection.receive("Voltage: 6.2 V\n")
+    await bittle_mcp.rules.drain()
+    assert setup_mock_connection.sent == ["d"]
+
+    result = await list_rules()
+    assert "low_battery" in result
+    assert "fired 1x" in result
+
+
+async def test_install_rule_invalid_operator():
+    result = await install_rule("bad", "voltage", "voltage", "~", 6.8, "rest")
+    assert "Unknown operator" in result
+
+
+async def test_install_rule_invalid_event():
+    result = await install_rule("bad", "volts", "voltage", "<", 6.8, "rest")
+    assert "Unknown event" in result
+    assert "bad" not in await list_rules()
+
+
+async def test_install_rule_invalid_field():
+    result = await install_rule("v", "voltage", "volts", "<", 6.8, "rest")
+    assert "Unknown field for voltage: volts" in result
+    assert "No rules installed" in await list_rules()
+
+
+async def test_remove_rule():
+    await install_rule("low_battery", "voltage", "voltage", "<", 6.8, "rest")
+    assert "Removed" in await remove_rule("low_battery")
+    assert "Unknown rule" in await remove_rule("low_battery")
+    assert "No rules installed" in await list_rules()
+
+
+# --- gait analytics ---
+
+async def test_record_and_analyze_gait(setup_mock_connection):
+    pytest.importorskip("numpy")
+    await connect("AA:BB:CC:DD:EE:FF")
+    assert "Recording" in await start_recording("walk")
+    for _ in range(300):
+        setup_mock_connection.receive("0.0\t1.0\t-1.0\n")
+    assert "300 samples" in await stop_recording()
+
+    result = await analyze_gait(["walk"], window=0.5)
+    assert "walk:" in result
+
+
+async def test_analyze_gait_unknown_session():
+    result = await analyze_gait(["nope"])
+    assert "Unknown session" in result
+
+
+async def test_stop_recording_when_idle():
+    assert "Not recording" in await stop_recording()
+
+
+# --- heading controller ---
+
+async def test_hold_heading_and_stop(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    setup_mock_connection.receive("12.0\t0.0\t0.0\n")
+    result = await hold_heading()
+    assert "Holding heading 12.0" in result
+    assert "running" in await controller_status()
+    assert "Controller stopped" in await stop_controller()
+    assert "not running" in await stop_controller()
+
+
+async def test_hold_heading_trot_keeps_state_model(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    setup_mock_connection.receive("0.0\t0.0\t0.0\n")
+    await hold_heading(gait="trot")
+    await asyncio.sleep(0.15)
+    await stop_controller()
+    assert setup_mock_connection.sent[0] == "ktrF"
+    assert set(setup_mock_connection.sent) <= set(bittle_mcp.COMMANDS.values())
+    assert bittle_mcp.state.motion == "ktrF"
+
+
+async def test_hold_heading_without_telemetry(setup_mock_connection):
+    await connect("AA:BB:CC:DD:EE:FF")
+    result = await hold_heading()
+    assert "No yaw reading" in result
+
+
+async def test_tune_controller():
+    result = await tune_controller(kp=2.5, deadband=3.0)
+    assert bittle_mcp.controller.gains.kp == 2.5
+    assert bittle_mcp.controller.gains.deadband == 3.0
+    assert "idle" in result
+
+
+# --- mock mode ---
+
+async def test_lifespan_uses_mock_when_env_set(monkeypatch):
+    monkeypatch.setenv("BITTLE_MCP_MOCK", "1")
+    async with bittle_mcp.app_lifespan(bittle_mcp.mcp) as ctx:
+        assert isinstance(ctx["bittle"], MockBittleConnection)
+
+
+async def test_lifespan_uses_real_connection_by_default(monkeypatch):
+    monkeypatch.delenv("BITTLE_MCP_MOCK", raising=False)
+    async with bittle_mcp.app_lifespan(bittle_mcp.mcp) as ctx:
+        assert type(ctx["bittle"]) is BittleConnection
+
+
+async def test_lifespan_io_thread(monkeypatch):
+    monkeypatch.setenv("BITTLE_MCP_MOCK", "1")
+    monkeypatch.setenv("BITTLE_MCP_IO_THREAD", "1")
+    async with bittle_mcp.app_lifespan(bittle_mcp.mcp) as ctx:
+        conn = ctx["bittle"]
+        assert isinstance(conn, ThreadedBittleConnection)
+        assert isinstance(conn.inner, MockBittleConnection)
+        assert conn.running
+    assert not conn.running
+
+
+async def test_lifespan_simulation(monkeypatch):
+    monkeypatch.setenv("BITTLE_MCP_MOCK", "sim")
+    monkeypatch.delenv("BITTLE_MCP_IO_THREAD", raising=False)
+    async with bittle_mcp.app_lifespan(bittle_mcp.mcp) as ctx:
+        assert isinstance(ctx["bittle"], SimulatedBittleConnection)
+
+
+# --- main ---
+
+def test_main_configures_logging_format(monkeypatch):
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    monkeypatch.setattr(bittle_mcp.mcp, "run", lambda transport: None)
+    try:
+        bittle_mcp.main([])
+        assert len(root.handlers) == 1
+        assert root.handlers[0].formatter._fmt == "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+        assert root.level == logging.INFO
+    finally:
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        for handler in handlers:
+            root.addHandler(handler)
+        root.setLevel(level)
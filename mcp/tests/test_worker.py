@@ -0,0 +1,168 @@
+"""Tests for running Bluetooth I/O on a dedicated thread."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from bittle_mcp.bluetooth import MockBittleConnection
+from bittle_mcp.controller import HeadingController
+from bittle_mcp.rules import Rule, RulesEngine
+from bittle_mcp.state import RobotState
+from bittle_mcp.worker import ThreadedBittleConnection
+
+
+@pytest.fixture
+async def conn():
+    conn = ThreadedBittleConnection(MockBittleConnection())
+    yield conn
+    if conn.is_connected:
+        await conn.disconnect()
+    conn.close()
+
+
+async def test_connect_send_disconnect(conn):
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+    assert conn.running
+    assert conn.is_connected
+    assert conn.address == "AA:BB:CC:DD:EE:FF"
+
+    await conn.send("ksit")
+    assert conn.inner.sent == ["ksit"]
+
+    await conn.disconnect()
+    assert not conn.is_connected
+
+
+async def test_send_while_disconnected_raises(conn):
+    with pytest.raises(RuntimeError):
+        await conn.send("ksit")
+
+
+async def test_writes_run_on_worker_thread(conn):
+    threads = []
+    original = conn.inner._write
+
+    async def record(command):
+        threads.append(threading.current_thread())
+        await original(command)
+
+    conn.inner._write = record
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+    await conn.send("ksit")
+    assert threads and threads[0] is not threading.current_thread()
+    assert threads[0].name == "bittle-ble-io"
+
+
+async def test_telemetry_delivered_on_caller_loop(conn):
+    received = []
+    conn.add_listener(lambda event: received.append((event, threading.current_thread())))
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+
+    await conn.send("P")  # mock answers on the worker loop
+    for _ in range(50):
+        if received:
+            break
+        await asyncio.sleep(0.01)
+
+    event, thread = received[0]
+    assert event.kind == "voltage"
+    assert thread is threading.current_thread()
+
+
+async def test_ring_overflow_counts_dropped(conn):
+    small = ThreadedBittleConnection(MockBittleConnection(), telemetry_capacity=2)
+    for _ in range(3):
+        small.inner.receive("Voltage: 7.0 V\n")
+    assert small.dropped_events == 1
+
+
+async def test_state_follows_threaded_connection(conn):
+    state = RobotState()
+    state.attach(conn)
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+    await conn.send("ksit")
+    assert state.is_redundant("ksit")
+    assert await state.reconcile(timeout=1.0)
+    state.detach()
+
+
+async def test_rules_react_on_worker_while_mcp_loop_blocked(conn):
+    engine = RulesEngine()
+    engine.attach(conn.inner)
+    engine.install(Rule("low", "voltage", "voltage", "<", 6.8, "rest"))
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+
+    conn.loop.call_soon_threadsafe(conn.inner.receive, "Voltage: 6.0 V\n")
+    time.sleep(0.2)  # a slow tool holding the MCP loop
+    assert conn.inner.sent == ["d"]
+    await engine.drain()
+    engine.detach()
+
+
+async def test_state_sees_commands_sent_on_worker(conn):
+    state = RobotState()
+    state.attach(conn)
+    engine = RulesEngine()
+    engine.attach(conn.inner)
+    engine.install(Rule("low", "voltage", "voltage", "<", 6.8, "sit"))
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+
+    conn.loop.call_soon_threadsafe(conn.inner.receive, "Voltage: 6.0 V\n")
+    await engine.drain()
+    await asyncio.sleep(0.05)
+    assert state.motion == "ksit"
+    engine.detach()
+    state.detach()
+
+
+async def test_priority_send_cancels_job_on_mcp_loop(conn):
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+    job = asyncio.create_task(asyncio.sleep(10))
+    conn.track_motion(job)
+
+    await conn.send("d")
+    await asyncio.sleep(0.05)
+    assert job.cancelled()
+    assert conn.stop_latencies
+
+
+async def test_motion_job_sending_rest_is_not_cancelled(conn):
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+
+    async def routine():
+        await conn.send("d")
+        await conn.send("ksit")
+
+    job = asyncio.create_task(routine())
+    conn.track_motion(job)
+    await job
+    assert conn.inner.sent == ["d", "ksit"]
+
+
+async def test_controller_runs_on_worker_loop(conn):
+    threads = []
+    original = conn.inner._write
+
+    async def record(command):
+        threads.append(threading.current_thread())
+        await original(command)
+
+    conn.inner._write = record
+    await conn.connect("AA:BB:CC:DD:EE:FF")
+    controller = HeadingController(rate=50)
+    controller.attach(conn.inner, conn.loop)
+    conn.loop.call_soon_threadsafe(conn.inner.receive, "0.0\t0.0\t0.0\t0\t0\t0\t0\n")
+    await asyncio.sleep(0.05)
+
+    controller.start(target=0.0)
+    for _ in range(50):
+        if controller.commands_sent:
+            break
+        conn.loop.call_soon_threadsafe(conn.inner.receive, "0.0\t0.0\t0.0\t0\t0\t0\t0\n")
+        await asyncio.sleep(0.02)
+    controller.detach()
+
+    assert conn.inner.sent[0] == "kwkF"
+    assert threads[0].name == "bittle-ble-io"